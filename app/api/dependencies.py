@@ -1,31 +1,30 @@
 """
 Common dependencies for API routes
 """
-from fastapi import Depends, HTTPException, status
+import time
+from functools import lru_cache
+from typing import Optional
+from cachetools import TTLCache
+from fastapi import Depends, HTTPException, Request, status
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.redis_client import redis_client
 from app.services.animation_service import AnimationService
 from app.services.file_service import FileService
 from app.utils.logger import logger
 
 
-# Service instances
-_animation_service = None
-_file_service = None
-
-
+@lru_cache(maxsize=1)
 def get_animation_service() -> AnimationService:
     """Dependency to get animation service instance"""
-    global _animation_service
-    if _animation_service is None:
-        _animation_service = AnimationService()
-    return _animation_service
+    return AnimationService()
 
 
+@lru_cache(maxsize=1)
 def get_file_service() -> FileService:
     """Dependency to get file service instance"""
-    global _file_service
-    if _file_service is None:
-        _file_service = FileService()
-    return _file_service
+    return FileService()
 
 
 async def validate_task_id(task_id: str) -> str:
@@ -39,46 +38,107 @@ async def validate_task_id(task_id: str) -> str:
 
 
 class RateLimiter:
-    """Simple in-memory rate limiter"""
+    """Simple in-memory token bucket rate limiter"""
     
-    def __init__(self, max_requests: int = 10, window_minutes: int = 1):
+    def __init__(self, max_requests: int = 10, window_minutes: int = 1, max_buckets: int = 100_000):
         self.max_requests = max_requests
         self.window_minutes = window_minutes
-        self.requests = {}
+        # client -> (tokens, last_refill); an idle bucket refills completely within one
+        # window, so expiring it after that is lossless and bounds memory under IP rotation
+        self.buckets: TTLCache = TTLCache(maxsize=max_buckets, ttl=window_minutes * 60)
     
     async def check_rate_limit(self, client_ip: str) -> bool:
         """Check if client has exceeded rate limit"""
-        import time
         current_time = time.time()
-        window_start = current_time - (self.window_minutes * 60)
+        capacity = float(self.max_requests)
+        rate = self.max_requests / (self.window_minutes * 60)
         
-        # Clean old requests
-        if client_ip in self.requests:
-            self.requests[client_ip] = [
-                req_time for req_time in self.requests[client_ip] 
-                if req_time > window_start
-            ]
-        else:
-            self.requests[client_ip] = []
+        # Refill tokens for the time elapsed since the last request
+        tokens, last_refill = self.buckets.get(client_ip, (capacity, current_time))
+        tokens = min(capacity, tokens + (current_time - last_refill) * rate)
         
         # Check if limit exceeded
-        if len(self.requests[client_ip]) >= self.max_requests:
+        if tokens < 1:
+            self.buckets[client_ip] = (tokens, current_time)
             return False
         
-        # Add current request
-        self.requests[client_ip].append(current_time)
+        # Consume a token for the current request
+        self.buckets[client_ip] = (tokens - 1, current_time)
         return True
 
 
+# Sliding-window counter: the current window's count plus the previous
+# window's count weighted by how much of it still overlaps the sliding window.
+# KEYS[1] = current window key, KEYS[2] = previous window key
+# ARGV[1] = max requests, ARGV[2] = window seconds, ARGV[3] = seconds elapsed in current window
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+
+local estimate = current + previous * (1 - elapsed / window)
+if estimate >= limit then
+    return 0
+end
+
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], window * 2)
+return 1
+"""
+
+
+class RedisRateLimiter:
+    """Redis-backed sliding window rate limiter shared across workers"""
+    
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        max_requests: int = 10,
+        window_minutes: int = 1,
+        fallback: Optional[RateLimiter] = None
+    ):
+        self.max_requests = max_requests
+        self.window_seconds = window_minutes * 60
+        self.redis = redis
+        # register_script runs via EVALSHA and reloads the script if Redis lost it
+        self.script = self.redis.register_script(SLIDING_WINDOW_SCRIPT)
+        self.fallback = fallback
+    
+    async def check_rate_limit(self, client_ip: str) -> bool:
+        """Check if client has exceeded rate limit"""
+        current_time = time.time()
+        window_index = int(current_time // self.window_seconds)
+        elapsed = current_time - window_index * self.window_seconds
+        
+        try:
+            allowed = await self.script(
+                keys=[f"rl:{client_ip}:{window_index}", f"rl:{client_ip}:{window_index - 1}"],
+                args=[self.max_requests, self.window_seconds, elapsed]
+            )
+            return bool(allowed)
+        except RedisError as e:
+            if self.fallback is None:
+                raise
+            logger.warning(f"Redis rate limiter unavailable, using local limiter: {e}")
+            return await self.fallback.check_rate_limit(client_ip)
+
+
 # Global rate limiter instance
-rate_limiter = RateLimiter()
+rate_limiter = RedisRateLimiter(
+    redis_client,
+    max_requests=settings.max_requests_per_minute,
+    fallback=RateLimiter(max_requests=settings.max_requests_per_minute)
+)
 
 
-async def check_rate_limit(client_ip: str = None):
-    """Rate limiting dependency"""
-    if client_ip and not await rate_limiter.check_rate_limit(client_ip):
+async def check_rate_limit(request: Request) -> str:
+    """Rate limiting dependency, returns the client IP it was applied to"""
+    client_ip = request.client.host if request.client else "unknown"
+    if not await rate_limiter.check_rate_limit(client_ip):
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Rate limit exceeded. Please try again later."
         )
-    return True
\ No newline at end of file
+    return client_ip
@@ -1,8 +1,9 @@
 """
 Animation API routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from datetime import datetime
 from typing import Dict, Any
 from app.models.requests import AnimationRequest
 from app.models.responses import AnimationResponse, AnimationStatus, RefinedPrompt, ErrorResponse
@@ -22,9 +23,8 @@ router = APIRouter(prefix="/api/animations", tags=["animations"])
 @router.post("/generate", response_model=AnimationResponse)
 async def generate_animation(
     request: AnimationRequest,
-    http_request: Request,
     animation_service: AnimationService = Depends(get_animation_service),
-    _: bool = Depends(check_rate_limit)
+    client_ip: str = Depends(check_rate_limit)
 ):
     """
     Generate a new animation from a text prompt
@@ -37,10 +37,6 @@ async def generate_animation(
     - **include_audio**: Whether to include audio narration (not yet implemented)
     """
     try:
-        # Get client IP for rate limiting
-        client_ip = http_request.client.host
-        await check_rate_limit(client_ip)
-        
         logger.info(f"Animation generation request from {client_ip}: {request.prompt[:100]}...")
         
         response = await animation_service.create_animation(request)
@@ -58,30 +54,43 @@ async def generate_animation(
 
 @router.get("/status/{task_id}", response_model=AnimationStatus)
 async def get_animation_status(
+    response: Response,
     task_id: str = Depends(validate_task_id),
+    wait: int = Query(default=0, ge=0, le=60, description="Seconds to wait for a status change before responding"),
     animation_service: AnimationService = Depends(get_animation_service)
 ):
     """
     Get the status of an animation generation task
     
     - **task_id**: The unique task identifier returned when creating the animation
+    - **wait**: Long-poll for up to this many seconds until the status changes (default: 0)
     
     Status values:
     - **pending**: Task is waiting to be processed
     - **processing**: Task is currently being processed
+    - **queued**: Prompt is refined, waiting for a free render slot
     - **completed**: Animation has been generated successfully
     - **failed**: Animation generation failed
+    
+    Unfinished tasks include a Retry-After header that grows with task age (1s up to 5m).
     """
     try:
-        status = await animation_service.get_animation_status(task_id)
+        if wait > 0:
+            await animation_service.wait_for_update(task_id, timeout=wait)
+        
+        task_status = await animation_service.get_animation_status(task_id)
         
-        if not status:
+        if not task_status:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Task not found"
             )
         
-        return status
+        if task_status.status not in ['completed', 'failed']:
+            age = (datetime.now() - task_status.created_at).total_seconds()
+            response.headers["Retry-After"] = str(min(300, max(1, int(age // 10))))
+        
+        return task_status
         
     except HTTPException:
         raise
@@ -93,6 +102,50 @@ async def get_animation_status(
         )
 
 
+@router.get("/status/{task_id}/stream")
+async def stream_animation_status(
+    task_id: str = Depends(validate_task_id),
+    animation_service: AnimationService = Depends(get_animation_service)
+):
+    """
+    Stream status changes of an animation task as Server-Sent Events
+    
+    - **task_id**: The unique task identifier
+    
+    Sends the current status immediately, then one event per state change.
+    The stream closes once the task is completed or failed.
+    """
+    if not await animation_service.get_animation_status(task_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    
+    async def event_stream():
+        last_event = None
+        while True:
+            task_status = await animation_service.get_animation_status(task_id)
+            if not task_status:
+                break
+            
+            # Unchanged status after a timeout: send a comment line so proxies keep the connection open
+            event = f"data: {task_status.model_dump_json()}\n\n"
+            yield event if event != last_event else ": keep-alive\n\n"
+            last_event = event
+            
+            if task_status.status in ['completed', 'failed']:
+                break
+            
+            seen = {'status': task_status.status, 'progress': task_status.progress, 'message': task_status.message}
+            await animation_service.wait_for_update(task_id, timeout=15, seen=seen)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
 @router.get("/download/{task_id}")
 async def download_animation(
     task_id: str = Depends(validate_task_id),
@@ -188,22 +241,11 @@ async def list_animations(
     Returns a dictionary of all tasks with their current status
     """
     try:
-        tasks = animation_service.get_all_tasks()
-        
-        # Return simplified view
-        simplified_tasks = {}
-        for task_id, task_data in tasks.items():
-            simplified_tasks[task_id] = {
-                'status': task_data['status'],
-                'progress': task_data['progress'],
-                'message': task_data['message'],
-                'created_at': task_data['created_at'].isoformat(),
-                'prompt': task_data['request']['prompt'][:100] + '...' if len(task_data['request']['prompt']) > 100 else task_data['request']['prompt']
-            }
+        tasks = await animation_service.get_task_summaries()
         
         return {
-            'total_tasks': len(simplified_tasks),
-            'tasks': simplified_tasks
+            'total_tasks': len(tasks),
+            'tasks': tasks
         }
         
     except Exception as e:
@@ -214,8 +256,25 @@ async def list_animations(
         )
 
 
+async def _do_cleanup(hours: int, animation_service: AnimationService, file_service: FileService):
+    """Run the task, animation file and temp file sweeps after the response is sent"""
+    try:
+        cleaned_tasks = await animation_service.cleanup_old_tasks(hours)
+        cleaned_files = await file_service.cleanup_old_animations(days=hours//24 or 1)
+        cleaned_temp = await file_service.cleanup_temp_files()
+        
+        logger.info(
+            f"Cleanup completed. Removed {cleaned_tasks} tasks, {cleaned_files} animation files, "
+            f"and {cleaned_temp} temp files."
+        )
+        
+    except Exception as e:
+        logger.error(f"Error during cleanup: {str(e)}")
+
+
 @router.delete("/cleanup")
 async def cleanup_old_tasks(
+    background_tasks: BackgroundTasks,
     hours: int = 24,
     animation_service: AnimationService = Depends(get_animation_service),
     file_service: FileService = Depends(get_file_service)
@@ -225,31 +284,14 @@ async def cleanup_old_tasks(
     
     - **hours**: Remove tasks older than this many hours (default: 24)
     
-    Returns cleanup statistics
+    The sweep runs in the background; results are written to the log
     """
-    try:
-        # Clean up old tasks
-        cleaned_tasks = animation_service.cleanup_old_tasks(hours)
-        
-        # Clean up old files
-        cleaned_files = await file_service.cleanup_old_animations(days=hours//24 or 1)
-        
-        # Clean up temp files
-        cleaned_temp = await file_service.cleanup_temp_files()
-        
-        return {
-            'cleaned_tasks': cleaned_tasks,
-            'cleaned_animation_files': cleaned_files,
-            'cleaned_temp_files': cleaned_temp,
-            'message': f'Cleanup completed. Removed {cleaned_tasks} tasks, {cleaned_files} animation files, and {cleaned_temp} temp files.'
-        }
-        
-    except Exception as e:
-        logger.error(f"Error during cleanup: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to perform cleanup"
-        )
+    background_tasks.add_task(_do_cleanup, hours, animation_service, file_service)
+    
+    return {
+        'status': 'scheduled',
+        'message': f'Cleanup of tasks and files older than {hours} hours has been scheduled.'
+    }
 
 
 @router.get("/storage-stats")
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet
 import asyncio
 import os
+from importlib import metadata
 from app.models.responses import (
     HealthResponse, 
     DetailedHealthResponse,
@@ -9,14 +12,44 @@ from app.models.responses import (
     LivenessResponse
 )
 from app.core.config import settings
+from app.core.manim_worker import manim_available
+from app.utils.helpers import cached_with_ttl
 from app.utils.logger import logger
-from app.services.file_service import FileService  # Import FileService
+from app.api.dependencies import get_file_service
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 
 
+def _probe_gemini() -> str:
+    """Check that Gemini is configured and its client library is importable"""
+    if not settings.gemini_api_key:
+        return "unhealthy: Gemini API key not configured"
+    try:
+        import google.generativeai
+        return "healthy"
+    except Exception as e:
+        return f"unhealthy: {str(e)}"
+
+
+def _probe_manim() -> str:
+    """Check that Manim is installed, without paying for its import"""
+    if manim_available():
+        return "healthy"
+    return "unhealthy: manim is not installed"
+
+
+# Dependency availability cannot change without a restart, so probe once at import
+_GEMINI_STATUS = _probe_gemini()
+_MANIM_STATUS = _probe_manim()
+
+
+def _verified_dirs(request: Request) -> FrozenSet[str]:
+    """Directories created and checked for write access at startup"""
+    return getattr(request.app.state, "verified_dirs", frozenset())
+
+
 @router.get("/", response_model=HealthResponse)
-async def health_check():
+async def health_check(request: Request):
     """
     Basic health check endpoint
     
@@ -25,34 +58,18 @@ async def health_check():
     try:
         services_status = {}
         
-        # Check Gemini API availability
-        try:
-            import google.generativeai as genai
-            genai.configure(api_key=settings.gemini_api_key)
-            services_status["gemini"] = "healthy"
-        except Exception as e:
-            services_status["gemini"] = f"unhealthy: {str(e)}"
+        # Gemini and Manim availability are probed once at startup
+        services_status["gemini"] = _GEMINI_STATUS
+        services_status["manim"] = _MANIM_STATUS
         
-        # Check Manim availability
-        try:
-            import manim
-            services_status["manim"] = "healthy"
-        except Exception as e:
-            services_status["manim"] = f"unhealthy: {str(e)}"
-        
-        # Check file system
-        try:
-            # Check if output directories exist and are writable
-            output_dir = settings.output_dir
-            if os.path.exists(output_dir) and os.access(output_dir, os.W_OK):
-                services_status["filesystem"] = "healthy"
-            else:
-                services_status["filesystem"] = "unhealthy: output directory not writable"
-        except Exception as e:
-            services_status["filesystem"] = f"unhealthy: {str(e)}"
+        # Check file system (output directory verified writable at startup)
+        if settings.output_dir in _verified_dirs(request):
+            services_status["filesystem"] = "healthy"
+        else:
+            services_status["filesystem"] = "unhealthy: output directory not writable"
         
         # Overall status
-        overall_status = "healthy" if all("healthy" in status for status in services_status.values()) else "degraded"
+        overall_status = "healthy" if all(status == "healthy" for status in services_status.values()) else "degraded"
         
         return HealthResponse(
             status=overall_status,
@@ -71,47 +88,61 @@ async def health_check():
         )
 
 
+@lru_cache(maxsize=1)
+def _get_service_versions() -> Dict[str, str]:
+    """Collect dependency versions once, they cannot change at runtime"""
+    service_versions = {}
+    
+    try:
+        import google.generativeai as genai
+        service_versions["google-generativeai"] = genai.__version__
+    except:
+        service_versions["google-generativeai"] = "not available"
+    
+    try:
+        service_versions["manim"] = metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        service_versions["manim"] = "not available"
+    
+    try:
+        import fastapi
+        service_versions["fastapi"] = fastapi.__version__
+    except:
+        service_versions["fastapi"] = "unknown"
+    
+    return service_versions
+
+
+def _collect_system_info() -> Dict[str, Any]:
+    """Gather host information; blocking, run it in a worker thread"""
+    import psutil
+    import sys
+    
+    memory = psutil.virtual_memory()
+    return {
+        "python_version": sys.version,
+        "platform": sys.platform,
+        "cpu_count": os.cpu_count(),
+        "memory_total_gb": round(memory.total / (1024**3), 2),
+        "memory_available_gb": round(memory.available / (1024**3), 2),
+        "disk_free_gb": round(psutil.disk_usage('/').free / (1024**3), 2),
+    }
+
+
 @router.get("/detailed", response_model=DetailedHealthResponse)
+@cached_with_ttl(5.0)
 async def detailed_health_check():
     """
     Detailed health check with system information
     
-    Returns comprehensive system and service status
+    Returns comprehensive system and service status, cached for 5 seconds
     """
     try:
-        import psutil
-        import sys
-        
-        # System information
-        system_info = {
-            "python_version": sys.version,
-            "platform": sys.platform,
-            "cpu_count": os.cpu_count(),
-            "memory_total_gb": round(psutil.virtual_memory().total / (1024**3), 2),
-            "memory_available_gb": round(psutil.virtual_memory().available / (1024**3), 2),
-            "disk_free_gb": round(psutil.disk_usage('/').free / (1024**3), 2),
-        }
+        # System information (psutil makes blocking syscalls, keep them off the event loop)
+        system_info = await asyncio.to_thread(_collect_system_info)
         
         # Service versions
-        service_versions = {}
-        
-        try:
-            import google.generativeai as genai
-            service_versions["google-generativeai"] = genai.__version__
-        except:
-            service_versions["google-generativeai"] = "not available"
-        
-        try:
-            import manim
-            service_versions["manim"] = manim.__version__
-        except:
-            service_versions["manim"] = "not available"
-        
-        try:
-            import fastapi
-            service_versions["fastapi"] = fastapi.__version__
-        except:
-            service_versions["fastapi"] = "unknown"
+        service_versions = _get_service_versions()
         
         # Configuration check
         config_status = {
@@ -123,7 +154,7 @@ async def detailed_health_check():
         
         # File system stats
         try:
-            file_service = FileService()
+            file_service = get_file_service()
             storage_stats = file_service.get_storage_stats()
         except Exception as e:
             storage_stats = {"error": str(e)}
@@ -153,7 +184,7 @@ async def detailed_health_check():
 
 
 @router.get("/ready", response_model=ReadinessResponse)
-async def readiness_check():
+async def readiness_check(request: Request):
     """
     Kubernetes-style readiness check
     
@@ -165,14 +196,21 @@ async def readiness_check():
         if not settings.gemini_api_key:
             checks.append("Gemini API key not configured")
         
-        if not os.path.exists(settings.output_dir):
-            checks.append("Output directory does not exist")
+        verified_dirs = _verified_dirs(request)
+        for name, directory in (
+            ("Output", settings.output_dir),
+            ("Temp", settings.temp_dir),
+            ("Animation", settings.animation_dir),
+        ):
+            if directory not in verified_dirs:
+                checks.append(f"{name} directory does not exist or is not writable")
         
         try:
             import google.generativeai
-            import manim
         except ImportError as e:
             checks.append(f"Required module not available: {e}")
+        if not manim_available():
+            checks.append("Required module not available: manim")
         
         if checks:
             return ReadinessResponse(
@@ -2,55 +2,92 @@
 Configuration settings for the animation backend
 """
 import os
-from typing import Optional
-from pydantic import BaseSettings, Field
+from typing import FrozenSet, List, Optional
+from pydantic import AliasChoices, Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     """Application configuration settings"""
     
     # API Configuration
-    app_name: str = Field(default="Animation Generator API", env="APP_NAME")
-    debug: bool = Field(default=False, env="DEBUG")
-    host: str = Field(default="0.0.0.0", env="HOST")
-    port: int = Field(default=8000, env="PORT")
+    app_name: str = "Animation Generator API"
+    debug: bool = False
+    host: str = "0.0.0.0"
+    port: int = 8000
     
     # Gemini AI Configuration
-    gemini_api_key: str = Field(..., env="GEMINI_API_KEY")
-    gemini_model: str = Field(default="gemini-1.5-flash", env="GEMINI_MODEL")
-    gemini_temperature: float = Field(default=0.7, env="GEMINI_TEMPERATURE")
-    gemini_max_tokens: int = Field(default=2048, env="GEMINI_MAX_TOKENS")
+    gemini_api_key: str
+    gemini_model: str = "gemini-1.5-flash"
+    gemini_temperature: float = 0.7
+    gemini_max_tokens: int = 2048
+    gemini_cache_ttl: int = 86400  # seconds
     
     # File Paths
-    output_dir: str = Field(default="outputs", env="OUTPUT_DIR")
-    temp_dir: str = Field(default="outputs/temp", env="TEMP_DIR")
-    animation_dir: str = Field(default="outputs/animations", env="ANIMATION_DIR")
-    template_dir: str = Field(default="templates", env="TEMPLATE_DIR")
+    output_dir: str = "outputs"
+    temp_dir: str = "outputs/temp"
+    animation_dir: str = "outputs/animations"
+    template_dir: str = "templates"
+    manim_media_dir: str = "outputs/media"  # Manim's working/cache directory
+    log_dir: str = "logs"
     
     # Animation Settings
-    animation_quality: str = Field(default="medium_quality", env="ANIMATION_QUALITY")
-    animation_format: str = Field(default="mp4", env="ANIMATION_FORMAT")
-    max_animation_duration: int = Field(default=30, env="MAX_ANIMATION_DURATION")  # seconds
+    animation_quality: str = "medium_quality"
+    animation_format: str = "mp4"
+    max_animation_duration: int = 30  # seconds
+    render_cache_max_mb: int = 2048  # size cap for reusable renders
+    manim_workers: int = 2  # persistent render processes, 0 renders each task in a fresh interpreter
+    # seconds before a render is killed; ANIMATION_TIMEOUT is the older name of this setting
+    render_timeout: int = Field(300, validation_alias=AliasChoices("render_timeout", "animation_timeout"))
+    max_concurrent_renders: int = 0  # 0 = one less than the CPU count (capped by manim_workers)
+    max_concurrent_gemini: int = 8  # simultaneous prompt refinement calls
+    
+    # Scheduled cleanup
+    task_retention_hours: int = 24
+    task_cleanup_interval_minutes: int = 15
+    animation_retention_days: int = 7
+    animation_cleanup_interval_hours: int = 6
+    
+    # Downloads (delegate file transfer to nginx via X-Accel-Redirect)
+    use_x_accel: bool = False
+    x_accel_prefix: str = "/_protected/animations/"
     
     # Rate limiting
-    max_requests_per_minute: int = Field(default=10, env="MAX_REQUESTS_PER_MINUTE")
+    max_requests_per_minute: int = 10
     
     # Redis Configuration (for task queue)
-    redis_url: str = Field(default="redis://localhost:6379", env="REDIS_URL")
+    redis_url: str = "redis://localhost:6379"
+    task_store_backend: str = "redis"  # "redis" (shared across workers) or "memory"
     
     # Security
-    cors_origins: list = Field(default=["*"], env="CORS_ORIGINS")
+    cors_origins: List[str] = ["*"]
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    # Field names map to upper-cased env vars; unknown keys in .env are ignored
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        extra="ignore",
+        frozen=True
+    )
 
 
 # Create global settings instance
 settings = Settings()
 
-# Ensure directories exist
-os.makedirs(settings.output_dir, exist_ok=True)
-os.makedirs(settings.temp_dir, exist_ok=True)
-os.makedirs(settings.animation_dir, exist_ok=True)
-os.makedirs(settings.template_dir, exist_ok=True)
\ No newline at end of file
+
+def ensure_directories() -> FrozenSet[str]:
+    """
+    Create the output directories if needed
+    
+    Returns:
+        The directories that exist and are writable
+    """
+    verified = set()
+    for directory in (settings.output_dir, settings.temp_dir, settings.animation_dir, settings.template_dir):
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if os.access(directory, os.W_OK):
+                verified.add(directory)
+        except OSError:
+            pass
+    return frozenset(verified)
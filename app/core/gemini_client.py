@@ -2,13 +2,113 @@
 Gemini AI client for prompt refinement and Manim code generation
 """
 import google.generativeai as genai
+import hashlib
+from functools import lru_cache
 from typing import Optional
-import json
+import orjson
 from app.core.config import settings
+from app.utils.helpers import redis_cached
 from app.utils.logger import logger
 from app.models.requests import AnimationStyle
 
 
+# Structured output schema, so Gemini returns a bare JSON object we can parse directly
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "refined_prompt": {"type": "STRING"},
+        "manim_code": {"type": "STRING"},
+        "explanation": {"type": "STRING"},
+        "estimated_duration": {"type": "INTEGER"},
+        "key_elements": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["refined_prompt", "manim_code", "explanation"],
+}
+
+
+def _prompt_cache_key(
+    client: "GeminiClient",
+    prompt: str,
+    style: AnimationStyle = AnimationStyle.EDUCATIONAL,
+    duration: int = 10
+) -> str:
+    """Content hash of everything that shapes a Gemini response"""
+    return hashlib.blake2b(f"{prompt}|{style.value}|{duration}".encode(), digest_size=16).hexdigest()
+
+
+STYLE_GUIDELINES = {
+    AnimationStyle.MATHEMATICAL: """
+- Focus on mathematical concepts, equations, graphs
+- Use mathematical notation and symbols
+- Include step-by-step derivations or proofs
+- Use colors that highlight mathematical relationships
+- Consider geometric transformations and algebraic manipulations
+""",
+    AnimationStyle.EDUCATIONAL: """
+- Create clear, easy-to-follow explanations
+- Use simple, clean visuals
+- Include text explanations alongside visuals
+- Build concepts progressively
+- Use educational color schemes (blues, greens)
+""",
+    AnimationStyle.SCIENTIFIC: """
+- Focus on scientific accuracy and precision
+- Use scientific notation and units
+- Include data visualizations, charts, diagrams
+- Use professional color schemes
+- Show cause-and-effect relationships
+""",
+    AnimationStyle.PRESENTATION: """
+- Create polished, professional-looking animations
+- Use corporate-friendly colors and fonts
+- Focus on clear messaging and key points
+- Include smooth transitions and engaging visuals
+- Emphasize important information
+""",
+    AnimationStyle.CREATIVE: """
+- Use vibrant colors and creative visual effects
+- Include artistic elements and creative transitions
+- Experiment with unique visual styles
+- Focus on visual appeal and engagement
+- Use creative typography and design elements
+"""
+}
+
+
+@lru_cache(maxsize=None)
+def _build_system_prompt(style_value: str, duration: int) -> str:
+    """Generate system prompt based on animation style, memoized per (style, duration)"""
+    
+    base_prompt = f"""You are an expert Manim (Mathematical Animation Engine) developer. Your task is to:
+
+1. Refine the user's prompt to be more specific and animation-friendly
+2. Generate working Manim code that creates the requested animation
+3. Ensure the animation duration is approximately {duration} seconds
+
+Animation Style: {style_value}
+
+Requirements:
+- Generate complete, executable Manim code
+- Use proper Manim syntax and imports
+- Include appropriate animations and transitions
+- Code should be production-ready
+- Animation should be visually appealing and smooth
+- Use colors and styling appropriate for {style_value} content
+
+Response Format (JSON):
+{{
+    "refined_prompt": "Detailed, specific description of the animation",
+    "manim_code": "Complete Manim Python code",
+    "explanation": "Brief explanation of what the animation does",
+    "estimated_duration": {duration},
+    "key_elements": ["list", "of", "main", "visual", "elements"]
+}}
+
+Style-specific guidelines:"""
+    
+    return base_prompt + STYLE_GUIDELINES.get(style_value, STYLE_GUIDELINES[AnimationStyle.EDUCATIONAL])
+
+
 class GeminiClient:
     """Client for interacting with Google Gemini AI"""
     
@@ -18,6 +118,7 @@ class GeminiClient:
         self.model = genai.GenerativeModel(settings.gemini_model)
         logger.info(f"Initialized Gemini client with model: {settings.gemini_model}")
     
+    @redis_cached("gemini", _prompt_cache_key, ttl=settings.gemini_cache_ttl)
     async def refine_prompt_and_generate_code(
         self, 
         prompt: str, 
@@ -38,14 +139,16 @@ class GeminiClient:
         try:
             logger.info(f"Processing prompt with Gemini: {prompt[:100]}...")
             
-            system_prompt = self._get_system_prompt(style, duration)
+            system_prompt = _build_system_prompt(style.value, duration)
             full_prompt = f"{system_prompt}\n\nUser Request: {prompt}"
             
-            response = self.model.generate_content(
+            response = await self.model.generate_content_async(
                 full_prompt,
                 generation_config=genai.types.GenerationConfig(
                     temperature=settings.gemini_temperature,
                     max_output_tokens=settings.gemini_max_tokens,
+                    response_mime_type="application/json",
+                    response_schema=RESPONSE_SCHEMA,
                 )
             )
             
@@ -63,128 +166,18 @@ class GeminiClient:
             logger.error(f"Error in Gemini processing: {str(e)}")
             raise Exception(f"Failed to process prompt with Gemini: {str(e)}")
     
-    def _get_system_prompt(self, style: AnimationStyle, duration: int) -> str:
-        """Generate system prompt based on animation style"""
-        
-        base_prompt = f"""You are an expert Manim (Mathematical Animation Engine) developer. Your task is to:
-
-1. Refine the user's prompt to be more specific and animation-friendly
-2. Generate working Manim code that creates the requested animation
-3. Ensure the animation duration is approximately {duration} seconds
-
-Animation Style: {style.value}
-
-Requirements:
-- Generate complete, executable Manim code
-- Use proper Manim syntax and imports
-- Include appropriate animations and transitions
-- Code should be production-ready
-- Animation should be visually appealing and smooth
-- Use colors and styling appropriate for {style.value} content
-
-Response Format (JSON):
-{{
-    "refined_prompt": "Detailed, specific description of the animation",
-    "manim_code": "Complete Manim Python code",
-    "explanation": "Brief explanation of what the animation does",
-    "estimated_duration": {duration},
-    "key_elements": ["list", "of", "main", "visual", "elements"]
-}}
-
-Style-specific guidelines:"""
-
-        style_guidelines = {
-            AnimationStyle.MATHEMATICAL: """
-- Focus on mathematical concepts, equations, graphs
-- Use mathematical notation and symbols
-- Include step-by-step derivations or proofs
-- Use colors that highlight mathematical relationships
-- Consider geometric transformations and algebraic manipulations
-""",
-            AnimationStyle.EDUCATIONAL: """
-- Create clear, easy-to-follow explanations
-- Use simple, clean visuals
-- Include text explanations alongside visuals
-- Build concepts progressively
-- Use educational color schemes (blues, greens)
-""",
-            AnimationStyle.SCIENTIFIC: """
-- Focus on scientific accuracy and precision
-- Use scientific notation and units
-- Include data visualizations, charts, diagrams
-- Use professional color schemes
-- Show cause-and-effect relationships
-""",
-            AnimationStyle.PRESENTATION: """
-- Create polished, professional-looking animations
-- Use corporate-friendly colors and fonts
-- Focus on clear messaging and key points
-- Include smooth transitions and engaging visuals
-- Emphasize important information
-""",
-            AnimationStyle.CREATIVE: """
-- Use vibrant colors and creative visual effects
-- Include artistic elements and creative transitions
-- Experiment with unique visual styles
-- Focus on visual appeal and engagement
-- Use creative typography and design elements
-"""
-        }
-        
-        return base_prompt + style_guidelines.get(style, style_guidelines[AnimationStyle.EDUCATIONAL])
-    
     def _parse_response(self, response_text: str) -> dict:
-        """Parse Gemini response into structured format"""
+        """Parse Gemini JSON-mode response into structured format"""
         try:
-            # Try to extract JSON from the response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
-                raise Exception("No JSON found in response")
-            
-            json_str = response_text[start_idx:end_idx]
-            result = json.loads(json_str)
-            
-            # Validate required fields
-            required_fields = ['refined_prompt', 'manim_code', 'explanation']
-            for field in required_fields:
-                if field not in result:
-                    raise Exception(f"Missing required field: {field}")
-            
-            return result
-            
-        except json.JSONDecodeError as e:
+            result = orjson.loads(response_text)
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON response: {e}")
-            # Fallback: try to extract code blocks
-            return self._fallback_parse(response_text)
-        except Exception as e:
-            logger.error(f"Error parsing response: {e}")
             raise Exception(f"Failed to parse Gemini response: {str(e)}")
-    
-    def _fallback_parse(self, response_text: str) -> dict:
-        """Fallback parsing when JSON parsing fails"""
-        # Extract code blocks
-        code_start = response_text.find('```python')
-        if code_start == -1:
-            code_start = response_text.find('```')
         
-        if code_start != -1:
-            code_end = response_text.find('```', code_start + 3)
-            if code_end != -1:
-                manim_code = response_text[code_start:code_end + 3]
-                manim_code = manim_code.strip('`').strip()
-                if manim_code.startswith('python\n'):
-                    manim_code = manim_code[7:]
-            else:
-                manim_code = "# Failed to extract code"
-        else:
-            manim_code = "# No code found in response"
+        # Validate required fields
+        required_fields = ['refined_prompt', 'manim_code', 'explanation']
+        for field in required_fields:
+            if field not in result:
+                raise Exception(f"Failed to parse Gemini response: missing required field: {field}")
         
-        return {
-            'refined_prompt': "Refined prompt extraction failed",
-            'manim_code': manim_code,
-            'explanation': response_text[:500] + "..." if len(response_text) > 500 else response_text,
-            'estimated_duration': 10,
-            'key_elements': ['animation', 'visual', 'content']
-        }
\ No newline at end of file
+        return result
@@ -2,16 +2,82 @@
 Manim animation processor for executing generated code and creating videos
 """
 import os
+import re
+import shutil
+import signal
 import subprocess
+import sys
 import tempfile
+import textwrap
 import uuid
-from typing import Optional, Dict, Any
+from collections import deque
+from typing import Optional, Dict, Any, AsyncIterator, Awaitable, Callable, Deque, List
 import asyncio
 from pathlib import Path
 from app.core.config import settings
+from app.core.manim_worker import ManimUnavailableError, RenderTimeoutError, create_pool, manim_available, render_code
+from app.core.render_cache import RenderCache
 from app.utils.logger import logger
 
 
+# Precompiled patterns used to clean generated code
+_CONSTRUCT_RE = re.compile(r"(^[ \t]*def\s+construct\s*\(\s*self\s*\)\s*:[^\n]*\n)", re.M)
+# One scan finds everything _clean_manim_code checks for; the group name says what matched
+_PROBE_RE = re.compile(
+    r"(?P<imports>^[ \t]*(?:from\s+manim\s+import|import\s+manim)\b)"
+    r"|(?P<scene>\bclass\s+\w+\s*\([^)]*Scene[^)]*\))"
+    r"|(?P<background>background_color)",
+    re.M
+)
+
+# Render driver output: progress bars redraw with carriage returns, Manim logs end in newlines
+_LINE_SPLIT_RE = re.compile(rb"[\r\n]")
+_PROGRESS_RE = re.compile(r"Animation (\d+):.*?(\d+)%")
+# Output lines after which a render cannot succeed, so it is stopped right away
+FATAL_MARKERS = ("LaTeX compilation error",)
+# Lines of driver output kept for error messages
+OUTPUT_TAIL_LINES = 50
+# Extra seconds a worker gets past the render timeout before it is considered lost
+POOL_TIMEOUT_GRACE = 30
+
+# Called with (animation index, percent) as the render driver reports progress
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+def _settle(future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None):
+    """Resolve a future unless it was already settled or cancelled"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _settle_threadsafe(loop: asyncio.AbstractEventLoop, future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None):
+    """Resolve a future from a worker pool's result thread"""
+    try:
+        loop.call_soon_threadsafe(_settle, future, result, error)
+    except RuntimeError:
+        pass  # the event loop already shut down
+
+
+async def _iter_lines(stream: asyncio.StreamReader) -> AsyncIterator[str]:
+    """Yield non-empty lines from a stream as they arrive"""
+    buffer = b""
+    while chunk := await stream.read(4096):
+        *lines, buffer = _LINE_SPLIT_RE.split(buffer + chunk)
+        for line in lines:
+            if line.strip():
+                yield line.decode(errors="replace")
+    if buffer.strip():
+        yield buffer.decode(errors="replace")
+
+
+# Root of the project, so the stdin render driver can be run as app.core.manim_worker
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
 class ManimProcessor:
     """Processor for executing Manim code and generating animations"""
     
@@ -19,14 +85,65 @@ class ManimProcessor:
         """Initialize Manim processor"""
         self.output_dir = Path(settings.animation_dir)
         self.temp_dir = Path(settings.temp_dir)
-        logger.info("Initialized Manim Processor")
+        self.media_dir = Path(settings.manim_media_dir)  # persists compiled Tex/SVG files across tasks
+        self.render_cache = RenderCache(self.output_dir / ".render_cache")
+        self.driver_env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(PROJECT_ROOT), os.environ.get("PYTHONPATH")])),
+            "PYTHONUNBUFFERED": "1"  # so driver output can be followed while it renders
+        }
+        
+        # Persistent render workers; without manim installed locally, fall back to the render driver
+        self.pool = None
+        self._pool_futures = set()
+        self._pool_lock = asyncio.Lock()
+        if settings.manim_workers > 0 and manim_available():
+            self.pool = create_pool(settings.manim_workers)
+        
+        logger.info("Initialized Manim Processor ({} mode)", 'worker pool' if self.pool else 'subprocess')
+    
+    def close(self):
+        """Stop the render workers, abandoning renders still in progress"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+    
+    def _submit_to_pool(self, *args: Any) -> asyncio.Future:
+        """Queue a render in the worker pool and return a future for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pool.apply_async(
+            render_code,
+            args,
+            callback=lambda result: _settle_threadsafe(loop, future, result),
+            error_callback=lambda error: _settle_threadsafe(loop, future, error=error)
+        )
+        self._pool_futures.add(future)
+        future.add_done_callback(self._pool_futures.discard)
+        return future
+    
+    async def _restart_pool(self, old_pool):
+        """Replace a worker pool whose worker stopped responding"""
+        async with self._pool_lock:
+            if self.pool is not old_pool:
+                return  # another render already restarted it
+            
+            logger.warning("Render worker stopped responding, restarting the worker pool")
+            self.pool = await asyncio.to_thread(create_pool, settings.manim_workers)
+            
+            # Renders still queued on the old pool will never complete
+            for future in list(self._pool_futures):
+                _settle(future, error=Exception("Render worker pool was restarted"))
+            await asyncio.to_thread(old_pool.terminate)
     
     async def generate_animation(
         self,
         manim_code: str,
         task_id: str,
         quality: str = "medium_quality",
-        background_color: str = "#000000"
+        background_color: str = "#000000",
+        progress_callback: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         """
         Generate animation from Manim code
@@ -36,27 +153,47 @@ class ManimProcessor:
             task_id: Unique task identifier
             quality: Animation quality setting
             background_color: Background color for animation
+            progress_callback: Receives render progress (subprocess mode only)
             
         Returns:
             Dictionary with generation results
         """
         try:
-            logger.info(f"Starting animation generation for task {task_id}")
+            logger.info("Starting animation generation for task {}", task_id)
+            
+            # Clean and validate the code
+            cleaned_code = self._clean_manim_code(manim_code, background_color)
             
-            # Prepare the code file
-            code_file = await self._prepare_code_file(manim_code, task_id, background_color)
+            # Identical code renders to an identical video, so reuse a previous render
+            cache_key = RenderCache.make_key(cleaned_code, quality, background_color)
+            output_path = self.output_dir / f"animation_{task_id}.mp4"
             
-            # Execute Manim command
-            output_path = await self._execute_manim(code_file, task_id, quality)
+            if await asyncio.to_thread(self.render_cache.restore, cache_key, output_path):
+                logger.info("Reused cached render for task {}", task_id)
+                return {
+                    'success': True,
+                    'file_path': str(output_path),
+                    'file_size': output_path.stat().st_size,
+                    'task_id': task_id,
+                    'message': 'Animation generated successfully (cached)'
+                }
+            
+            # Render straight from memory, no code file is written
+            output_path = await self._render_code(cleaned_code, task_id, quality, progress_callback)
             
             # Verify output file exists
             if not output_path.exists():
                 raise Exception("Animation file was not generated")
             
+            try:
+                await asyncio.to_thread(self.render_cache.store, cache_key, output_path)
+            except Exception as e:
+                logger.warning("Failed to cache render for task {}: {}", task_id, e)
+            
             # Get file information
             file_size = output_path.stat().st_size
             
-            logger.info(f"Animation generated successfully for task {task_id}")
+            logger.info("Animation generated successfully for task {}", task_id)
             
             return {
                 'success': True,
@@ -66,37 +203,22 @@ class ManimProcessor:
                 'message': 'Animation generated successfully'
             }
             
+        except RenderTimeoutError as e:
+            logger.error("Render timed out for task {}: {}", task_id, e)
+            return {
+                'success': False,
+                'error': 'render_timeout',
+                'task_id': task_id,
+                'message': f'Animation generation failed: {str(e)}'
+            }
         except Exception as e:
-            logger.error(f"Error generating animation for task {task_id}: {str(e)}")
+            logger.error("Error generating animation for task {}: {}", task_id, e)
             return {
                 'success': False,
                 'error': str(e),
                 'task_id': task_id,
                 'message': f'Animation generation failed: {str(e)}'
             }
-        finally:
-            # Cleanup temporary files
-            try:
-                if 'code_file' in locals():
-                    code_file.unlink(missing_ok=True)
-            except Exception as e:
-                logger.warning(f"Failed to cleanup temp file: {e}")
-    
-    async def _prepare_code_file(self, manim_code: str, task_id: str, background_color: str) -> Path:
-        """Prepare the Manim code file for execution"""
-        
-        # Clean and validate the code
-        cleaned_code = self._clean_manim_code(manim_code, background_color)
-        
-        # Create temporary file
-        code_file = self.temp_dir / f"animation_{task_id}.py"
-        
-        # Write code to file
-        with open(code_file, 'w', encoding='utf-8') as f:
-            f.write(cleaned_code)
-        
-        logger.debug(f"Prepared code file: {code_file}")
-        return code_file
     
     def _clean_manim_code(self, code: str, background_color: str) -> str:
         """Clean and enhance Manim code"""
@@ -108,12 +230,15 @@ import math
 
 """
         
+        # One scan for imports, a Scene subclass and an explicit background color
+        found = {match.lastgroup for match in _PROBE_RE.finditer(code)}
+        
         # Check if code already has imports
-        if "from manim import" not in code and "import manim" not in code:
+        if "imports" not in found:
             code = standard_imports + code
         
         # Ensure there's a scene class
-        if "class " not in code or "Scene" not in code:
+        if "scene" not in found:
             # Wrap code in a basic scene
             code = f"""{standard_imports}
 
@@ -127,103 +252,236 @@ class GeneratedAnimation(Scene):
 """
         else:
             # Just add background color setting
-            if "background_color" not in code:
-                # Find the construct method and add background color
-                lines = code.split('\n')
-                for i, line in enumerate(lines):
-                    if "def construct(self):" in line:
-                        lines.insert(i + 1, f'        self.camera.background_color = "{background_color}"')
-                        break
-                code = '\n'.join(lines)
+            if "background" not in found:
+                # Add background color as the first statement of the construct method
+                background_line = f'        self.camera.background_color = "{background_color}"\n'
+                code = _CONSTRUCT_RE.sub(lambda match: match.group(1) + background_line, code, count=1)
         
         return code
     
     def _indent_code(self, code: str, spaces: int) -> str:
         """Indent code by specified number of spaces"""
-        indent = ' ' * spaces
-        return '\n'.join(indent + line if line.strip() else line for line in code.split('\n'))
+        return textwrap.indent(code, ' ' * spaces)
+    
+    async def _render_code(
+        self,
+        cleaned_code: str,
+        task_id: str,
+        quality: str,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Path:
+        """Render the animation in the worker pool, or in a driver subprocess when unavailable"""
+        if self.pool is not None:
+            try:
+                return await self._render_in_pool(cleaned_code, task_id, quality)
+            except ManimUnavailableError as e:
+                logger.warning("Render worker unavailable, falling back to subprocess: {}", e)
+        
+        return await self._render_subprocess(cleaned_code, task_id, quality, progress_callback)
     
-    async def _execute_manim(self, code_file: Path, task_id: str, quality: str) -> Path:
-        """Execute Manim command to generate animation"""
+    async def _render_in_pool(self, cleaned_code: str, task_id: str, quality: str) -> Path:
+        """Render the animation in a pre-warmed worker process"""
+        
+        output_filename = f"animation_{task_id}.mp4"
+        output_path = self.output_dir / output_filename
+        partial_dir = self.temp_dir / f"partial_{task_id}"
+        
+        logger.info("Rendering task {} in worker pool", task_id)
+        
+        try:
+            pool = self.pool
+            pool_task = self._submit_to_pool(
+                cleaned_code,
+                quality,
+                str(self.media_dir.resolve()),
+                str(self.output_dir.resolve()),
+                output_filename,
+                str(partial_dir.resolve()),
+                settings.render_timeout
+            )
+            try:
+                # The worker enforces the render timeout itself; this catches workers that died or hung
+                movie_file = await asyncio.wait_for(pool_task, timeout=settings.render_timeout + POOL_TIMEOUT_GRACE)
+            except asyncio.TimeoutError:
+                await self._restart_pool(pool)
+                raise RenderTimeoutError(f"Render worker did not respond within {settings.render_timeout}s")
+        except (ManimUnavailableError, RenderTimeoutError):
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to execute Manim: {str(e)}")
+        finally:
+            await asyncio.to_thread(shutil.rmtree, partial_dir, ignore_errors=True)
+        
+        logger.info("Manim render completed successfully")
+        return await asyncio.to_thread(self._move_to_output, Path(movie_file), output_path)
+    
+    async def _render_subprocess(
+        self,
+        cleaned_code: str,
+        task_id: str,
+        quality: str,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Path:
+        """Render the animation in a fresh interpreter, piping the code over stdin"""
         
         # Determine output file name
         output_filename = f"animation_{task_id}.mp4"
         output_path = self.output_dir / output_filename
+        partial_dir = self.temp_dir / f"partial_{task_id}"
         
-        # Build Manim command
+        # Build render driver command
         cmd = [
-            "manim",
-            str(code_file),
-            "--format=mp4",
+            sys.executable,
+            "-m", "app.core.manim_worker",
             f"--quality={quality}",
+            f"--media_dir={self.media_dir.resolve()}",
+            f"--video_dir={self.output_dir.resolve()}",
             f"--output_file={output_filename}",
-            "--disable_caching",
-            "--flush_cache"
+            f"--partial_dir={partial_dir.resolve()}"
         ]
         
-        logger.info(f"Executing Manim command: {' '.join(cmd)}")
+        logger.opt(lazy=True).info("Executing render driver: {}", lambda: ' '.join(cmd))
         
         try:
             # Execute command asynchronously
             process = await asyncio.create_subprocess_exec(
                 *cmd,
+                stdin=asyncio.subprocess.PIPE,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
-                cwd=str(self.output_dir)
+                cwd=str(self.output_dir),
+                env=self.driver_env,
+                # Own process group, so a timeout also kills Manim's LaTeX/ffmpeg children
+                start_new_session=os.name == "posix",
+                creationflags=getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
             )
             
-            stdout, stderr = await process.communicate()
+            # Follow both streams as they are written instead of buffering them until exit
+            stdout_tail: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+            stderr_tail: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+            watchers = [
+                asyncio.create_task(self._watch_output(process.stdout, stdout_tail, progress_callback)),
+                asyncio.create_task(self._watch_output(process.stderr, stderr_tail, progress_callback))
+            ]
+            try:
+                fatal_line = await asyncio.wait_for(
+                    self._supervise(process, cleaned_code, watchers),
+                    timeout=settings.render_timeout
+                )
+            except asyncio.TimeoutError:
+                await self._kill_process_group(process)
+                raise RenderTimeoutError(f"Render exceeded {settings.render_timeout}s")
+            finally:
+                for watcher in watchers:
+                    watcher.cancel()
+            
+            if fatal_line is not None:
+                await self._kill_process_group(process)
+                logger.error("Manim execution stopped early: {}", fatal_line)
+                raise Exception(f"Manim execution failed: {fatal_line}")
             
             if process.returncode != 0:
-                error_msg = stderr.decode() if stderr else "Unknown Manim error"
-                logger.error(f"Manim execution failed: {error_msg}")
+                error_msg = '\n'.join(stderr_tail) or "Unknown Manim error"
+                logger.error("Manim execution failed: {}", error_msg)
                 raise Exception(f"Manim execution failed: {error_msg}")
             
-            logger.info(f"Manim execution completed successfully")
-            
-            # Find the generated file (Manim might create subdirectories)
-            generated_file = self._find_generated_file(task_id)
-            if generated_file and generated_file != output_path:
-                # Move file to expected location
-                generated_file.rename(output_path)
+            logger.info("Manim execution completed successfully")
             
-            return output_path
+            # The driver prints the path of the rendered video last, after Manim's own output
+            if not stdout_tail:
+                raise Exception("Render driver did not report an output file")
+            movie_file = stdout_tail[-1]
+            return await asyncio.to_thread(self._move_to_output, Path(movie_file), output_path)
             
-        except asyncio.TimeoutError:
-            raise Exception("Manim execution timed out")
+        except RenderTimeoutError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to execute Manim: {str(e)}")
+        finally:
+            await asyncio.to_thread(shutil.rmtree, partial_dir, ignore_errors=True)
     
-    def _find_generated_file(self, task_id: str) -> Optional[Path]:
-        """Find the generated animation file"""
-        
-        # Common patterns where Manim might place files
-        search_patterns = [
-            f"animation_{task_id}.mp4",
-            f"*{task_id}*.mp4",
-            "*.mp4"
-        ]
+    async def _supervise(
+        self,
+        process: asyncio.subprocess.Process,
+        cleaned_code: str,
+        watchers: List[asyncio.Task]
+    ) -> Optional[str]:
+        """
+        Feed the code to the render driver and wait for it to finish
         
-        search_dirs = [
-            self.output_dir,
-            self.output_dir / "videos",
-            self.output_dir / "videos" / "1080p60",
-            self.output_dir / "videos" / "720p30",
-            self.output_dir / "videos" / "480p15"
-        ]
+        Returns:
+            The first fatal output line, as soon as it is seen, or None once the driver exits
+        """
+        try:
+            process.stdin.write(cleaned_code.encode('utf-8'))
+            await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # The driver exited before reading its input; its output says why
+            pass
         
-        for search_dir in search_dirs:
-            if not search_dir.exists():
-                continue
-                
-            for pattern in search_patterns:
-                files = list(search_dir.glob(pattern))
-                if files:
-                    # Return the most recent file
-                    return max(files, key=lambda f: f.stat().st_mtime)
+        for watcher in asyncio.as_completed(watchers):
+            fatal_line = await watcher
+            if fatal_line is not None:
+                return fatal_line
         
+        await process.wait()
         return None
     
+    async def _watch_output(
+        self,
+        stream: asyncio.StreamReader,
+        tail: Deque[str],
+        progress_callback: Optional[ProgressCallback]
+    ) -> Optional[str]:
+        """
+        Consume one output stream of the render driver
+        
+        Progress bar updates are forwarded to progress_callback, other lines are kept in tail.
+        
+        Returns:
+            The first fatal line, or None when the stream ends
+        """
+        last_progress = None
+        async for line in _iter_lines(stream):
+            match = _PROGRESS_RE.search(line)
+            if match:
+                progress = (int(match.group(1)), int(match.group(2)))
+                if progress_callback and progress != last_progress:
+                    last_progress = progress
+                    await progress_callback(*progress)
+                continue
+            
+            tail.append(line)
+            if any(marker in line for marker in FATAL_MARKERS):
+                return line
+        return None
+    
+    async def _kill_process_group(self, process: asyncio.subprocess.Process, grace: float = 2.0):
+        """Terminate a render and its children, escalating to SIGKILL after a grace period"""
+        if os.name != "posix":
+            process.kill()
+            await process.wait()
+            return
+        
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), timeout=grace)
+            except asyncio.TimeoutError:
+                pass
+            # Children may outlive the driver, so kill whatever is left of the group
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
+    
+    def _move_to_output(self, movie_path: Path, output_path: Path) -> Path:
+        """Move a rendered video to the location the task expects"""
+        if movie_path.resolve() != output_path.resolve():
+            movie_path.rename(output_path)
+        return output_path
+    
     async def get_animation_info(self, file_path: str) -> Dict[str, Any]:
         """Get information about generated animation"""
         try:
@@ -242,5 +500,5 @@ class GeneratedAnimation(Scene):
                 'file_extension': path.suffix
             }
         except Exception as e:
-            logger.error(f"Error getting animation info: {e}")
+            logger.error("Error getting animation info: {}", e)
             return {'error': str(e)}
\ No newline at end of file
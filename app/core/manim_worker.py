@@ -0,0 +1,171 @@
+"""
+Long-lived worker processes that render Manim scenes in-process
+
+Workers import manim once when they start, so each render skips the
+interpreter and library start-up cost of invoking the manim CLI.
+This module is imported inside the workers and must stay free of app imports.
+
+Run as ``python -m app.core.manim_worker`` it renders code read from stdin,
+which is how renders run when the worker pool is disabled.
+"""
+import argparse
+import hashlib
+import importlib.util
+import linecache
+import multiprocessing
+import signal
+import sys
+from contextlib import contextmanager
+from functools import lru_cache
+from multiprocessing.pool import Pool
+from types import CodeType
+from typing import Iterator, Optional
+
+
+TASK_MODULE_NAME = "__manim_task__"
+
+# Set in a worker when its initial manim import failed
+_import_error: Optional[str] = None
+
+
+class ManimUnavailableError(RuntimeError):
+    """Raised by a worker that could not import manim"""
+
+
+class RenderTimeoutError(RuntimeError):
+    """Raised when a render runs longer than its time limit"""
+
+
+def manim_available() -> bool:
+    """Check whether manim is installed without importing it"""
+    return importlib.util.find_spec("manim") is not None
+
+
+def _preimport_manim():
+    """Pool initializer: import manim (and with it numpy, cairo, ...) once per worker"""
+    global _import_error
+    try:
+        import manim  # noqa: F401
+    except Exception as e:
+        # Raising here would make the pool respawn the worker forever
+        _import_error = str(e)
+
+
+@lru_cache(maxsize=128)
+def _compile(source_hash: str, source: str) -> CodeType:
+    """Compile generated code once per worker; retries and re-renders reuse the code object"""
+    filename = f"<gen {source_hash[:8]}>"
+    # Let tracebacks show the generated source even though it never exists on disk
+    linecache.cache[filename] = (len(source), None, source.splitlines(keepends=True), filename)
+    return compile(source, filename, "exec")
+
+
+@contextmanager
+def _deadline(seconds: Optional[int]) -> Iterator[None]:
+    """Raise RenderTimeoutError in the main thread once seconds have elapsed"""
+    if not seconds or not hasattr(signal, "SIGALRM"):
+        yield
+        return
+    
+    def _expire(signum, frame):
+        raise RenderTimeoutError(f"Render exceeded {seconds}s")
+    
+    previous = signal.signal(signal.SIGALRM, _expire)
+    signal.alarm(seconds)
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def render_code(
+    code: str,
+    quality: str,
+    media_dir: str,
+    video_dir: str,
+    output_filename: str,
+    partial_dir: str,
+    timeout: Optional[int] = None
+) -> str:
+    """
+    Render the last Scene subclass defined in generated code
+    
+    Args:
+        code: The generated Manim code
+        quality: Manim quality name, e.g. "medium_quality"
+        media_dir: Manim media directory, shared so compiled Tex/SVG files are reused
+        video_dir: Directory the finished video is written to
+        output_filename: File name of the finished video
+        partial_dir: Scratch directory for partial movie files
+        timeout: Seconds before the render is aborted with RenderTimeoutError
+    
+    Returns:
+        Path of the rendered video
+    """
+    if _import_error is not None:
+        raise ManimUnavailableError(f"Manim is not available in worker: {_import_error}")
+    
+    from manim import Scene, tempconfig
+    
+    with _deadline(timeout):
+        namespace = {"__name__": TASK_MODULE_NAME}
+        exec(_compile(hashlib.sha256(code.encode()).hexdigest(), code), namespace)
+        
+        scene_classes = [
+            obj for obj in namespace.values()
+            if isinstance(obj, type) and issubclass(obj, Scene) and obj.__module__ == TASK_MODULE_NAME
+        ]
+        if not scene_classes:
+            raise RuntimeError("No Scene subclass found in generated code")
+        
+        with tempconfig({
+            "quality": quality,
+            "format": "mp4",
+            "media_dir": media_dir,
+            "video_dir": video_dir,
+            "partial_movie_dir": partial_dir,
+            "output_file": output_filename,
+            # Partial movies land in a per-task scratch dir, so hashing them for reuse is wasted work
+            "disable_caching": True,
+        }):
+            scene = scene_classes[-1]()
+            scene.render()
+            return str(scene.renderer.file_writer.movie_file_path)
+
+
+def create_pool(processes: int) -> Pool:
+    """Start the render workers; forkserver keeps them from inheriting the app's state"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method).Pool(
+        processes=processes,
+        initializer=_preimport_manim,
+        # Generated code runs in the worker, so recycle workers to contain leaked state
+        maxtasksperchild=50
+    )
+
+
+def main():
+    """Render code piped on stdin and print the path of the video"""
+    parser = argparse.ArgumentParser(description="Render Manim code read from stdin")
+    parser.add_argument("--quality", required=True)
+    parser.add_argument("--media_dir", required=True)
+    parser.add_argument("--video_dir", required=True)
+    parser.add_argument("--output_file", required=True)
+    parser.add_argument("--partial_dir", required=True)
+    args = parser.parse_args()
+    
+    _preimport_manim()
+    movie_file = render_code(
+        sys.stdin.read(),
+        args.quality,
+        args.media_dir,
+        args.video_dir,
+        args.output_file,
+        args.partial_dir
+    )
+    print(movie_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""
+Shared Redis client used for rate limiting and caching
+"""
+from redis import asyncio as aioredis
+from app.core.config import settings
+
+
+# Single connection pool shared by every module that talks to Redis
+redis_client = aioredis.Redis.from_url(settings.redis_url)
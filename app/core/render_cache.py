@@ -0,0 +1,118 @@
+"""
+Content-addressed cache of rendered animations
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+from app.utils.logger import logger
+
+
+def _link_or_copy(source: Path, destination: Path):
+    """Hardlink source to destination, copying when the filesystem can't link"""
+    destination.unlink(missing_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class RenderCache:
+    """Store of rendered mp4 files keyed by a hash of the code that produced them"""
+    
+    def __init__(self, cache_dir: Path):
+        """Initialize render cache and its SQLite index"""
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = cache_dir / "index.db"
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS renders ("
+                "key TEXT PRIMARY KEY, filename TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection; safe to use from worker threads"""
+        conn = sqlite3.connect(self.index_path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def make_key(cleaned_code: str, quality: str, background_color: str) -> str:
+        """Hash everything that determines the rendered output"""
+        return hashlib.sha256(f"{quality}|{background_color}|{cleaned_code}".encode()).hexdigest()
+    
+    def restore(self, key: str, output_path: Path) -> bool:
+        """
+        Place a cached render at output_path
+        
+        Args:
+            key: Cache key from make_key
+            output_path: Where the task expects its animation
+        
+        Returns:
+            True on a cache hit, False otherwise
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT filename FROM renders WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False
+            
+            cached_path = self.cache_dir / row[0]
+            if not cached_path.exists():
+                conn.execute("DELETE FROM renders WHERE key = ?", (key,))
+                return False
+            
+            _link_or_copy(cached_path, output_path)
+            conn.execute("UPDATE renders SET last_used = ? WHERE key = ?", (time.time(), key))
+            return True
+    
+    def store(self, key: str, rendered_path: Path):
+        """Add a freshly rendered animation to the cache"""
+        filename = f"{key}.mp4"
+        cached_path = self.cache_dir / filename
+        
+        if not cached_path.exists():
+            _link_or_copy(rendered_path, cached_path)
+        
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO renders (key, filename, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, filename, cached_path.stat().st_size, time.time())
+            )
+    
+    def evict(self, max_bytes: int) -> int:
+        """
+        Drop least recently used renders until the cache fits in max_bytes
+        
+        Returns:
+            Number of renders evicted
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT key, filename, size FROM renders ORDER BY last_used DESC").fetchall()
+            
+            total_size = 0
+            evicted = 0
+            for key, filename, size in rows:
+                total_size += size
+                if total_size <= max_bytes:
+                    continue
+                try:
+                    (self.cache_dir / filename).unlink(missing_ok=True)
+                    conn.execute("DELETE FROM renders WHERE key = ?", (key,))
+                    evicted += 1
+                except Exception as e:
+                    logger.warning(f"Failed to evict cached render {filename}: {e}")
+        
+        return evicted
@@ -0,0 +1,284 @@
+"""
+Task state storage, in-process or shared across workers through Redis
+"""
+import heapq
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import msgpack
+from cachetools import TTLCache
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.utils.logger import logger
+
+
+# Fields stored as POSIX timestamps and returned as datetimes
+DATETIME_FIELDS = frozenset({'created_at', 'updated_at', 'completed_at'})
+
+# Fields making up the list view of a task
+SUMMARY_FIELDS = ('status', 'progress', 'message', 'created_at', 'prompt_preview')
+
+TASK_KEY = "task:{}"
+CREATED_INDEX = "tasks:by_created"
+
+# HSET that refuses to resurrect a task deleted by cleanup while it was processing
+# KEYS[1] = task key, ARGV = field1, value1, field2, value2, ...
+UPDATE_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+
+def _summary(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the list view entry for a task"""
+    return {
+        'status': task.get('status'),
+        'progress': task.get('progress'),
+        'message': task.get('message'),
+        'created_at': task.get('created_at'),
+        'prompt': task.get('prompt_preview')
+    }
+
+
+class TaskStore:
+    """In-memory task storage, only visible to the current process"""
+    
+    def __init__(self):
+        """Initialize task store"""
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self._summaries: Dict[str, Dict[str, Any]] = {}  # Precomputed list view of tasks
+        self._by_created: List[Tuple[float, str]] = []  # Min-heap of (created timestamp, task_id)
+    
+    async def is_available(self) -> bool:
+        """Check whether the store can be reached"""
+        return True
+    
+    async def create(self, task_id: str, task: Dict[str, Any]):
+        """Store a new task"""
+        self.tasks[task_id] = task
+        self._summaries[task_id] = _summary(task)
+        heapq.heappush(self._by_created, (task['created_at'].timestamp(), task_id))
+    
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Get a task or None if it does not exist"""
+        return self.tasks.get(task_id)
+    
+    async def update(self, task_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Update fields of an existing task
+        
+        Returns:
+            False if the task does not exist (e.g. it was cleaned up)
+        """
+        task = self.tasks.get(task_id)
+        if task is None:
+            return False
+        
+        task.update(fields)
+        self._summaries[task_id] = _summary(task)
+        return True
+    
+    async def update_many(self, updates: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Apply field updates to several tasks at once
+        
+        Returns:
+            IDs of the tasks that still existed and were updated
+        """
+        return [task_id for task_id, fields in updates.items() if await self.update(task_id, fields)]
+    
+    async def all(self) -> Dict[str, Dict[str, Any]]:
+        """Get all tasks"""
+        return self.tasks
+    
+    async def summaries(self) -> Dict[str, Dict[str, Any]]:
+        """Get the list view of all tasks"""
+        return self._summaries
+    
+    async def delete_older_than(self, cutoff: float) -> List[str]:
+        """
+        Delete tasks created before a POSIX timestamp
+        
+        Returns:
+            IDs of the deleted tasks
+        """
+        # Only the expired prefix of the heap is visited, not every task
+        expired = []
+        while self._by_created and self._by_created[0][0] < cutoff:
+            _, task_id = heapq.heappop(self._by_created)
+            if self.tasks.pop(task_id, None) is not None:
+                self._summaries.pop(task_id, None)
+                expired.append(task_id)
+        return expired
+
+
+class RedisTaskStore(TaskStore):
+    """
+    Redis-backed task storage shared by every worker and machine
+    
+    Each task is a hash of msgpack-encoded fields at task:{id}; the sorted set
+    tasks:by_created indexes them by creation time. A short-lived local cache
+    absorbs tight polling loops without a Redis round-trip per request.
+    """
+    
+    def __init__(self, redis: aioredis.Redis, cache_size: int = 1024, cache_ttl: float = 1.0):
+        """Initialize Redis task store"""
+        self.redis = redis
+        self._update_script = redis.register_script(UPDATE_IF_EXISTS_SCRIPT)
+        # Entries expire quickly so updates made by other workers become visible
+        self._cache: TTLCache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+    
+    async def is_available(self) -> bool:
+        """Check whether Redis answers"""
+        try:
+            await self.redis.ping()
+            return True
+        except RedisError as e:
+            logger.warning(f"Redis task store unavailable: {e}")
+            return False
+    
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, bytes]:
+        """Encode task fields for a Redis hash"""
+        return {
+            name: msgpack.packb(value.timestamp() if isinstance(value, datetime) else value)
+            for name, value in fields.items()
+        }
+    
+    @staticmethod
+    def _decode_field(name: str, raw: Optional[bytes]) -> Any:
+        """Decode a single task field read from Redis"""
+        if raw is None:
+            return None
+        value = msgpack.unpackb(raw)
+        if name in DATETIME_FIELDS and value is not None:
+            return datetime.fromtimestamp(value)
+        return value
+    
+    @classmethod
+    def _decode(cls, raw: Dict[bytes, bytes]) -> Dict[str, Any]:
+        """Decode a task hash read from Redis"""
+        return {name.decode(): cls._decode_field(name.decode(), value) for name, value in raw.items()}
+    
+    async def create(self, task_id: str, task: Dict[str, Any]):
+        """Store a new task"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(TASK_KEY.format(task_id), mapping=self._encode(task))
+            pipe.zadd(CREATED_INDEX, {task_id: task['created_at'].timestamp()})
+            await pipe.execute()
+        self._cache[task_id] = dict(task)
+    
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Get a task or None if it does not exist"""
+        task = self._cache.get(task_id)
+        if task is not None:
+            return task
+        
+        raw = await self.redis.hgetall(TASK_KEY.format(task_id))
+        if not raw:
+            return None
+        
+        task = self._decode(raw)
+        self._cache[task_id] = task
+        return task
+    
+    async def update(self, task_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Update fields of an existing task
+        
+        Returns:
+            False if the task does not exist (e.g. it was cleaned up)
+        """
+        args = [item for pair in self._encode(fields).items() for item in pair]
+        if not await self._update_script(keys=[TASK_KEY.format(task_id)], args=args):
+            self._cache.pop(task_id, None)
+            return False
+        
+        cached = self._cache.get(task_id)
+        if cached is not None:
+            cached.update(fields)
+        return True
+    
+    async def update_many(self, updates: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Apply field updates to several tasks in a single pipeline
+        
+        Returns:
+            IDs of the tasks that still existed and were updated
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for task_id, fields in updates.items():
+                args = [item for pair in self._encode(fields).items() for item in pair]
+                await self._update_script(keys=[TASK_KEY.format(task_id)], args=args, client=pipe)
+            results = await pipe.execute()
+        
+        updated = []
+        for (task_id, fields), applied in zip(updates.items(), results):
+            if not applied:
+                self._cache.pop(task_id, None)
+                continue
+            cached = self._cache.get(task_id)
+            if cached is not None:
+                cached.update(fields)
+            updated.append(task_id)
+        return updated
+    
+    async def _task_ids(self) -> List[str]:
+        """IDs of all tasks, oldest first"""
+        return [task_id.decode() for task_id in await self.redis.zrange(CREATED_INDEX, 0, -1)]
+    
+    async def all(self) -> Dict[str, Dict[str, Any]]:
+        """Get all tasks"""
+        task_ids = await self._task_ids()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for task_id in task_ids:
+                pipe.hgetall(TASK_KEY.format(task_id))
+            results = await pipe.execute()
+        
+        return {task_id: self._decode(raw) for task_id, raw in zip(task_ids, results) if raw}
+    
+    async def summaries(self) -> Dict[str, Dict[str, Any]]:
+        """Get the list view of all tasks, reading only the summary fields"""
+        task_ids = await self._task_ids()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for task_id in task_ids:
+                pipe.hmget(TASK_KEY.format(task_id), SUMMARY_FIELDS)
+            results = await pipe.execute()
+        
+        summaries = {}
+        for task_id, values in zip(task_ids, results):
+            if values[0] is None:
+                continue
+            fields = {name: self._decode_field(name, raw) for name, raw in zip(SUMMARY_FIELDS, values)}
+            summaries[task_id] = _summary(fields)
+        return summaries
+    
+    async def delete_older_than(self, cutoff: float) -> List[str]:
+        """
+        Delete tasks created before a POSIX timestamp
+        
+        Returns:
+            IDs of the deleted tasks
+        """
+        expired = [task_id.decode() for task_id in await self.redis.zrangebyscore(CREATED_INDEX, 0, cutoff)]
+        if not expired:
+            return []
+        
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for task_id in expired:
+                pipe.delete(TASK_KEY.format(task_id))
+                self._cache.pop(task_id, None)
+            pipe.zrem(CREATED_INDEX, *expired)
+            await pipe.execute()
+        return expired
+
+
+def create_task_store() -> TaskStore:
+    """Build the task store selected by settings.task_store_backend"""
+    if settings.task_store_backend == "redis":
+        return RedisTaskStore(redis_client)
+    return TaskStore()
@@ -0,0 +1,83 @@
+"""
+FastAPI application entry point
+"""
+import asyncio
+import time
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.middleware.cors import CORSMiddleware
+from app.core.config import settings, ensure_directories
+from app.api.dependencies import get_animation_service, get_file_service
+from app.api.routes import animation, health
+from app.utils.logger import logger
+
+
+app = FastAPI(
+    title=settings.app_name,
+    debug=settings.debug,
+    default_response_class=ORJSONResponse  # orjson encodes datetimes natively and much faster
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.cors_origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(animation.router)
+app.include_router(health.router)
+
+
+@app.on_event("startup")
+async def prepare_directories():
+    """Create output directories once and remember which ones are usable"""
+    app.state.verified_dirs = ensure_directories()
+    logger.info(f"Verified directories: {sorted(app.state.verified_dirs)}")
+
+
+@app.on_event("startup")
+async def start_services():
+    """Build the services up front so render workers are warm before the first request"""
+    await get_animation_service().check_task_store()
+    get_file_service()
+
+
+async def periodic_cleanup():
+    """Expire old tasks every few minutes and old animation files every few hours"""
+    last_file_cleanup = time.monotonic()
+    
+    while True:
+        await asyncio.sleep(settings.task_cleanup_interval_minutes * 60)
+        try:
+            await get_animation_service().cleanup_old_tasks(settings.task_retention_hours)
+            
+            if time.monotonic() - last_file_cleanup >= settings.animation_cleanup_interval_hours * 3600:
+                last_file_cleanup = time.monotonic()
+                await get_file_service().cleanup_old_animations(days=settings.animation_retention_days)
+        except Exception as e:
+            logger.error(f"Scheduled cleanup failed: {str(e)}")
+
+
+@app.on_event("startup")
+async def start_periodic_cleanup():
+    """Run cleanup on a schedule instead of relying on the cleanup endpoint"""
+    app.state.cleanup_task = asyncio.create_task(periodic_cleanup())
+
+
+@app.on_event("shutdown")
+async def stop_periodic_cleanup():
+    """Stop the cleanup schedule"""
+    cleanup_task = getattr(app.state, "cleanup_task", None)
+    if cleanup_task is not None:
+        cleanup_task.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_render_workers():
+    """Flush queued task updates and shut down the Manim worker pool if the animation service was started"""
+    if get_animation_service.cache_info().currsize:
+        animation_service = get_animation_service()
+        await animation_service.flush_pending()
+        await asyncio.to_thread(animation_service.manim_processor.close)
@@ -0,0 +1,78 @@
+"""
+Pydantic models for API responses
+"""
+from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+
+class AnimationResponse(BaseModel):
+    """Response model for animation generation"""
+    task_id: str = Field(..., description="Unique task identifier")
+    status: str = Field(..., description="Task status")
+    message: str = Field(..., description="Status message")
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+class AnimationStatus(BaseModel):
+    """Model for animation status check"""
+    task_id: str
+    status: str  # pending, processing, queued, completed, failed
+    progress: int = Field(ge=0, le=100, description="Progress percentage")
+    message: str
+    file_url: Optional[str] = None
+    error_message: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    processing_time: Optional[float] = None  # seconds
+
+
+class RefinedPrompt(BaseModel):
+    """Model for refined prompt from Gemini"""
+    original_prompt: str
+    refined_prompt: str
+    manim_code: str
+    explanation: str
+    estimated_duration: int
+
+
+class HealthResponse(BaseModel):
+    """Health check response model"""
+    status: str
+    timestamp: datetime = Field(default_factory=datetime.now)
+    version: str = "1.0.0"
+    services: Dict[str, str] = Field(default_factory=dict)
+
+
+class ErrorResponse(BaseModel):
+    """Error response model"""
+    error: str
+    message: str
+    timestamp: datetime = Field(default_factory=datetime.now)
+    details: Optional[Dict[str, Any]] = None
+
+
+class DetailedHealthResponse(BaseModel):
+    """Detailed health check response model"""
+    status: str
+    timestamp: datetime = Field(default_factory=datetime.now)
+    system_info: Optional[Dict[str, Any]] = None
+    service_versions: Optional[Dict[str, str]] = None
+    configuration: Optional[Dict[str, Any]] = None
+    storage: Optional[Dict[str, Any]] = None
+    settings: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class ReadinessResponse(BaseModel):
+    """Readiness check response model"""
+    status: str
+    timestamp: datetime = Field(default_factory=datetime.now)
+    issues: Optional[List[str]] = None
+    error: Optional[str] = None
+
+
+class LivenessResponse(BaseModel):
+    """Liveness check response model"""
+    status: str
+    timestamp: datetime = Field(default_factory=datetime.now)
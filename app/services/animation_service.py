@@ -2,11 +2,15 @@
 Main animation service that orchestrates the entire animation generation process
 """
 import asyncio
+import os
+import time
 import uuid
 from datetime import datetime
 from typing import Dict, Any, Optional
+from app.core.config import settings
 from app.core.gemini_client import GeminiClient
 from app.core.manim_processor import ManimProcessor
+from app.core.task_store import TaskStore, create_task_store
 from app.models.requests import AnimationRequest
 from app.models.responses import AnimationResponse, AnimationStatus, RefinedPrompt
 from app.utils.logger import logger
@@ -19,9 +23,30 @@ class AnimationService:
         """Initialize animation service"""
         self.gemini_client = GeminiClient()
         self.manim_processor = ManimProcessor()
-        self.tasks: Dict[str, Dict[str, Any]] = {}  # In-memory task storage
+        self.store = create_task_store()
+        
+        # Backpressure: bursts queue up here instead of oversubscribing the CPU
+        render_limit = settings.max_concurrent_renders or max(1, (os.cpu_count() or 2) - 1)
+        if self.manim_processor.pool is not None:
+            render_limit = min(render_limit, settings.manim_workers)
+        self._render_sem = asyncio.Semaphore(render_limit)
+        self._gemini_sem = asyncio.Semaphore(settings.max_concurrent_gemini)
+        
+        self._pending: Dict[str, Dict[str, Any]] = {}  # Status updates waiting to be flushed
+        self._inflight: Dict[str, Dict[str, Any]] = {}  # Status updates being written right now
+        self._flush_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._conds: Dict[str, asyncio.Condition] = {}  # Notified on every task state change
+        self._versions: Dict[str, int] = {}  # Number of state changes per task, for waiters
         logger.info("Initialized Animation Service")
     
+    async def check_task_store(self):
+        """Fall back to in-process task storage when the configured store cannot be reached"""
+        if not await self.store.is_available():
+            logger.warning("Keeping tasks in memory; they are lost on restart and only visible to this worker")
+            self.store = TaskStore()
+    
     async def create_animation(self, request: AnimationRequest) -> AnimationResponse:
         """
         Start animation generation process
@@ -37,17 +62,21 @@ class AnimationService:
             task_id = str(uuid.uuid4())
             
             # Initialize task status
-            self.tasks[task_id] = {
+            prompt = request.prompt
+            created_at = datetime.now()
+            await self.store.create(task_id, {
                 'status': 'pending',
                 'progress': 0,
                 'message': 'Task created, waiting to start processing',
-                'created_at': datetime.now(),
-                'request': request.dict(),
+                'created_at': created_at,
+                'started_mono': time.monotonic_ns(),  # processing time, immune to wall-clock jumps
+                'request': request.model_dump(mode='json'),
+                'prompt_preview': prompt[:100] + '...' if len(prompt) > 100 else prompt,
                 'file_url': None,
                 'error_message': None
-            }
+            })
             
-            logger.info(f"Created animation task {task_id} with prompt: {request.prompt[:100]}...")
+            logger.info("Created animation task {} with prompt: {}...", task_id, request.prompt[:100])
             
             # Start background processing
             asyncio.create_task(self._process_animation(task_id, request))
@@ -56,11 +85,11 @@ class AnimationService:
                 task_id=task_id,
                 status='pending',
                 message='Animation generation started. Use the task ID to check status.',
-                created_at=datetime.now()
+                created_at=created_at
             )
             
         except Exception as e:
-            logger.error(f"Error creating animation task: {str(e)}")
+            logger.error("Error creating animation task: {}", e)
             raise Exception(f"Failed to create animation: {str(e)}")
     
     async def get_animation_status(self, task_id: str) -> Optional[AnimationStatus]:
@@ -73,14 +102,13 @@ class AnimationService:
         Returns:
             Animation status or None if task not found
         """
-        if task_id not in self.tasks:
+        task = await self._get_task(task_id)
+        if task is None:
             return None
         
-        task = self.tasks[task_id]
-        
         processing_time = None
-        if task.get('completed_at') and task.get('created_at'):
-            processing_time = (task['completed_at'] - task['created_at']).total_seconds()
+        if task.get('completed_mono') and task.get('started_mono'):
+            processing_time = (task['completed_mono'] - task['started_mono']) / 1e9
         
         return AnimationStatus(
             task_id=task_id,
@@ -102,36 +130,46 @@ class AnimationService:
             task_id: Task identifier
             request: Animation request parameters
         """
+        refined_result = None
+        rendered = False
         try:
-            logger.info(f"Starting processing for task {task_id}")
+            logger.info("Starting processing for task {}", task_id)
             
             # Step 1: Refine prompt with Gemini
             await self._update_task_status(task_id, 'processing', 10, 'Refining prompt with AI...')
             
-            refined_result = await self.gemini_client.refine_prompt_and_generate_code(
-                prompt=request.prompt,
-                style=request.style,
-                duration=request.duration or 10
-            )
+            async with self._gemini_sem:
+                refined_result = await self.gemini_client.refine_prompt_and_generate_code(
+                    prompt=request.prompt,
+                    style=request.style,
+                    duration=request.duration or 10
+                )
             
-            logger.info(f"Prompt refined for task {task_id}")
+            logger.info("Prompt refined for task {}", task_id)
             
-            # Step 2: Generate animation with Manim
-            await self._update_task_status(task_id, 'processing', 50, 'Generating animation...')
+            # Step 2: Generate animation with Manim, waiting for a free render slot
+            if self._render_sem.locked():
+                await self._update_task_status(task_id, 'queued', 30, 'Waiting for a free render slot...')
             
-            animation_result = await self.manim_processor.generate_animation(
-                manim_code=refined_result['manim_code'],
-                task_id=task_id,
-                quality=request.quality.value,
-                background_color=request.background_color or "#000000"
-            )
+            async with self._render_sem:
+                await self._update_task_status(task_id, 'processing', 50, 'Generating animation...')
+                
+                animation_result = await self.manim_processor.generate_animation(
+                    manim_code=refined_result['manim_code'],
+                    task_id=task_id,
+                    quality=request.quality.value,
+                    background_color=request.background_color or "#000000",
+                    progress_callback=self._render_progress_callback(task_id)
+                )
             
             if animation_result['success']:
+                rendered = True
+                
                 # Step 3: Finalize and complete
                 await self._update_task_status(task_id, 'processing', 90, 'Finalizing animation...')
                 
                 # Store additional task data
-                self.tasks[task_id].update({
+                await self.store.update(task_id, {
                     'refined_prompt': refined_result,
                     'animation_result': animation_result,
                     'file_path': animation_result['file_path']
@@ -148,10 +186,11 @@ class AnimationService:
                     file_url=file_url
                 )
                 
-                logger.info(f"Animation generation completed for task {task_id}")
+                logger.info("Animation generation completed for task {}", task_id)
                 
             else:
-                # Animation generation failed
+                # Animation generation failed; don't serve the same broken code to a retry
+                await self._forget_generated_code(request)
                 error_msg = animation_result.get('error', 'Unknown error in animation generation')
                 await self._update_task_status(
                     task_id, 
@@ -160,10 +199,12 @@ class AnimationService:
                     'Animation generation failed',
                     error_message=error_msg
                 )
-                logger.error(f"Animation generation failed for task {task_id}: {error_msg}")
+                logger.error("Animation generation failed for task {}: {}", task_id, error_msg)
                 
         except Exception as e:
             # Handle any unexpected errors
+            if refined_result is not None and not rendered:
+                await self._forget_generated_code(request)
             error_msg = f"Unexpected error: {str(e)}"
             await self._update_task_status(
                 task_id, 
@@ -172,7 +213,33 @@ class AnimationService:
                 'Processing failed due to unexpected error',
                 error_message=error_msg
             )
-            logger.error(f"Unexpected error in task {task_id}: {str(e)}")
+            logger.error("Unexpected error in task {}: {}", task_id, e)
+    
+    async def _forget_generated_code(self, request: AnimationRequest):
+        """Drop the cached Gemini response for a request whose code failed to render"""
+        await self.gemini_client.refine_prompt_and_generate_code.invalidate(
+            self.gemini_client,
+            prompt=request.prompt,
+            style=request.style,
+            duration=request.duration or 10
+        )
+    
+    def _render_progress_callback(self, task_id: str):
+        """Build a callback mapping render progress onto the 50-89% range of the task"""
+        highest = 50
+        
+        async def report(animation: int, percent: int):
+            nonlocal highest
+            # The number of animations in a scene is unknown, so never move the bar backwards
+            highest = max(highest, 50 + percent * 39 // 100)
+            await self._update_task_status(
+                task_id,
+                'processing',
+                highest,
+                f'Rendering animation {animation + 1} ({percent}%)...'
+            )
+        
+        return report
     
     async def _update_task_status(
         self, 
@@ -183,23 +250,124 @@ class AnimationService:
         file_url: Optional[str] = None,
         error_message: Optional[str] = None
     ):
-        """Update task status in memory"""
-        if task_id in self.tasks:
-            self.tasks[task_id].update({
-                'status': status,
-                'progress': progress,
-                'message': message,
-                'updated_at': datetime.now()
-            })
-            
-            if file_url:
-                self.tasks[task_id]['file_url'] = file_url
+        """Queue a task status update; the flusher writes it to the task store"""
+        now = datetime.now()
+        fields = {
+            'status': status,
+            'progress': progress,
+            'message': message,
+            'updated_at': now
+        }
+        
+        if file_url:
+            fields['file_url'] = file_url
+        
+        if error_message:
+            fields['error_message'] = error_message
+        
+        if status in ['completed', 'failed']:
+            fields['completed_at'] = now
+            fields['completed_mono'] = time.monotonic_ns()
+        
+        self._pending.setdefault(task_id, {}).update(fields)
+        self._flush_event.set()
+        
+        if self._flusher_task is None or self._flusher_task.done():
+            self._flusher_task = asyncio.create_task(self._flusher())
+    
+    async def _flusher(self):
+        """Write queued status updates in batches, coalescing updates made within 50 ms"""
+        while True:
+            await self._flush_event.wait()
+            self._flush_event.clear()
+            await asyncio.sleep(0.05)
+            if not await self.flush_pending():
+                # Back off before retrying so a store outage doesn't turn into a busy loop
+                await asyncio.sleep(1.0)
+    
+    async def flush_pending(self) -> bool:
+        """
+        Write all queued status updates to the task store and wake their waiters
+        
+        Returns:
+            False if the write failed; the updates are queued again for the next flush
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return True
             
-            if error_message:
-                self.tasks[task_id]['error_message'] = error_message
+            # Reads keep seeing the batch through _inflight until the write returns
+            pending, self._pending = self._pending, {}
+            self._inflight = pending
+            try:
+                updated = await self.store.update_many(pending)
+            except Exception as e:
+                logger.error("Failed to flush status updates for {} tasks: {}", len(pending), e)
+                # Requeue the batch; updates queued during the write are newer and win
+                for task_id, fields in pending.items():
+                    self._pending[task_id] = {**fields, **self._pending.get(task_id, {})}
+                self._flush_event.set()
+                return False
+            finally:
+                self._inflight = {}
+        
+        for task_id in updated:
+            await self._notify_task_update(task_id, final=pending[task_id].get('status') in ['completed', 'failed'])
+        return True
+    
+    async def _get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Get a task from the store with any not yet flushed updates applied"""
+        # Take the overlays before reading the store, which may complete a flush meanwhile
+        inflight = self._inflight.get(task_id)
+        pending = self._pending.get(task_id)
+        task = await self.store.get(task_id)
+        if task is None or (inflight is None and pending is None):
+            return task
+        return {**task, **(inflight or {}), **(pending or {})}
+    
+    async def _notify_task_update(self, task_id: str, final: bool = False):
+        """Wake everyone waiting on a task; finished tasks drop their condition"""
+        self._versions[task_id] = self._versions.get(task_id, 0) + 1
+        cond = self._conds.pop(task_id, None) if final else self._conds.get(task_id)
+        if final:
+            self._versions.pop(task_id, None)
+        if cond is not None:
+            async with cond:
+                cond.notify_all()
+    
+    async def wait_for_update(self, task_id: str, timeout: float, seen: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Wait until a task changes state
+        
+        Args:
+            task_id: Task identifier
+            timeout: Maximum number of seconds to wait
+            seen: Task fields the caller last saw; if the task no longer matches them, return at once
             
-            if status in ['completed', 'failed']:
-                self.tasks[task_id]['completed_at'] = datetime.now()
+        Returns:
+            True if the task changed, False on timeout or if it is already finished
+        """
+        # Register before reading the task, so a change made during the read is not missed
+        cond = self._conds.setdefault(task_id, asyncio.Condition())
+        version = self._versions.get(task_id, 0)
+        
+        task = await self._get_task(task_id)
+        if task is None or task['status'] in ['completed', 'failed']:
+            if self._conds.get(task_id) is cond:
+                del self._conds[task_id]  # nothing will notify it any more
+            return False
+        if seen and any(task.get(field) != value for field, value in seen.items()):
+            return True
+        
+        def changed() -> bool:
+            return self._conds.get(task_id) is not cond or self._versions.get(task_id, 0) != version
+        
+        async with cond:
+            try:
+                await asyncio.wait_for(cond.wait_for(changed), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
     
     async def get_refined_prompt(self, task_id: str) -> Optional[RefinedPrompt]:
         """
@@ -211,10 +379,10 @@ class AnimationService:
         Returns:
             Refined prompt details or None if not found
         """
-        if task_id not in self.tasks:
+        task = await self._get_task(task_id)
+        if task is None:
             return None
         
-        task = self.tasks[task_id]
         refined_data = task.get('refined_prompt')
         
         if not refined_data:
@@ -228,22 +396,23 @@ class AnimationService:
             estimated_duration=refined_data.get('estimated_duration', 10)
         )
     
-    def get_all_tasks(self) -> Dict[str, Dict[str, Any]]:
+    async def get_all_tasks(self) -> Dict[str, Dict[str, Any]]:
         """Get all tasks (for admin/debugging purposes)"""
-        return self.tasks
+        return await self.store.all()
+    
+    async def get_task_summaries(self) -> Dict[str, Dict[str, Any]]:
+        """Get the simplified view of all tasks"""
+        return await self.store.summaries()
     
-    def cleanup_old_tasks(self, hours: int = 24):
+    async def cleanup_old_tasks(self, hours: int = 24):
         """Clean up tasks older than specified hours"""
         cutoff_time = datetime.now().timestamp() - (hours * 3600)
         
-        tasks_to_remove = []
-        for task_id, task in self.tasks.items():
-            created_at = task['created_at'].timestamp()
-            if created_at < cutoff_time:
-                tasks_to_remove.append(task_id)
+        removed = await self.store.delete_older_than(cutoff_time)
         
-        for task_id in tasks_to_remove:
-            del self.tasks[task_id]
-            logger.info(f"Cleaned up old task: {task_id}")
+        for task_id in removed:
+            self._pending.pop(task_id, None)
+            await self._notify_task_update(task_id, final=True)
+            logger.info("Cleaned up old task: {}", task_id)
         
-        return len(tasks_to_remove)
\ No newline at end of file
+        return len(removed)
@@ -1,16 +1,58 @@
 """
 File service for handling animation file operations
 """
+import asyncio
 import os
+import time
 import aiofiles
+import anyio
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from fastapi import HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
 from app.core.config import settings
+from app.core.render_cache import RenderCache
 from app.utils.logger import logger
 
 
+class ZeroCopyFileResponse(FileResponse):
+    """FileResponse that hands the file to the server when it supports pathsend or zero-copy send"""
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        extensions = scope.get("extensions", {})
+        pathsend = "http.response.pathsend" in extensions
+        if not pathsend and "http.response.zerocopysend" not in extensions:
+            await super().__call__(scope, receive, send)
+            return
+        
+        if self.stat_result is None:
+            stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            self.set_stat_headers(stat_result)
+        
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif pathsend:
+            # The server opens and sends the file itself, e.g. with sendfile(2)
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        else:
+            # The server moves the bytes file -> socket in-kernel
+            fd = os.open(self.path, os.O_RDONLY)
+            try:
+                await send({"type": "http.response.zerocopysend", "file": fd, "more_body": False})
+            finally:
+                os.close(fd)
+        
+        if self.background is not None:
+            await self.background()
+
+
 class FileService:
     """Service for file operations and serving animations"""
     
@@ -18,6 +60,8 @@ class FileService:
         """Initialize file service"""
         self.animation_dir = Path(settings.animation_dir)
         self.temp_dir = Path(settings.temp_dir)
+        self.render_cache = RenderCache(self.animation_dir / ".render_cache")
+        self._path_cache: Dict[str, Path] = {}  # task_id -> file found by a directory search
         logger.info("Initialized File Service")
     
     async def get_animation_file(self, task_id: str) -> Optional[Path]:
@@ -37,39 +81,65 @@ class FileService:
             if expected_file.exists():
                 return expected_file
             
+            # Reuse the result of an earlier directory search
+            cached_path = self._path_cache.get(task_id)
+            if cached_path is not None:
+                if cached_path.exists():
+                    return cached_path
+                del self._path_cache[task_id]
+            
             # Search for files with task_id in name
             for file_path in self.animation_dir.glob(f"*{task_id}*"):
                 if file_path.suffix.lower() in ['.mp4', '.mov', '.avi']:
+                    self._path_cache[task_id] = file_path
                     return file_path
             
-            logger.warning(f"Animation file not found for task: {task_id}")
+            logger.warning("Animation file not found for task: {}", task_id)
             return None
             
         except Exception as e:
-            logger.error(f"Error finding animation file for task {task_id}: {str(e)}")
+            logger.error("Error finding animation file for task {}: {}", task_id, e)
             return None
     
-    def create_file_response(self, file_path: Path, task_id: str) -> FileResponse:
+    def create_file_response(self, file_path: Path, task_id: str) -> Response:
         """
-        Create FastAPI FileResponse for animation download
+        Create response for animation download
+        
+        When X-Accel-Redirect is enabled the body is left empty and nginx serves
+        the file; otherwise a FileResponse that uses pathsend/zero-copy send when the
+        server supports it is returned.
         
         Args:
             file_path: Path to the animation file
             task_id: Task identifier for filename
             
         Returns:
-            FileResponse for file download
+            Response for file download
         """
-        if not file_path.exists():
+        try:
+            stat_result = file_path.stat()
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Animation file not found")
         
         # Generate appropriate filename
         filename = f"animation_{task_id}.mp4"
         
-        return FileResponse(
+        if settings.use_x_accel:
+            return Response(
+                status_code=200,
+                media_type='video/mp4',
+                headers={
+                    "X-Accel-Redirect": f"{settings.x_accel_prefix}{file_path.name}",
+                    "Content-Disposition": f'attachment; filename="{filename}"'
+                }
+            )
+        
+        # Pass the stat we already have so the response doesn't stat the file again
+        return ZeroCopyFileResponse(
             path=str(file_path),
             filename=filename,
             media_type='video/mp4',
+            stat_result=stat_result,
             headers={
                 "Content-Disposition": f"attachment; filename={filename}"
             }
@@ -102,28 +172,46 @@ class FileService:
             }
             
         except Exception as e:
-            logger.error(f"Error getting file info: {str(e)}")
+            logger.error("Error getting file info: {}", e)
             return {"error": str(e)}
     
+    async def _unlink_all(self, paths: List[str], kind: str) -> List[str]:
+        """
+        Delete files concurrently on worker threads
+        
+        Args:
+            paths: Files to delete
+            kind: Description of the files for log messages
+            
+        Returns:
+            Paths that were deleted
+        """
+        results = await asyncio.gather(
+            *(asyncio.to_thread(os.unlink, path) for path in paths),
+            return_exceptions=True
+        )
+        
+        deleted = []
+        for path, result in zip(paths, results):
+            if isinstance(result, Exception):
+                logger.warning("Failed to delete {} {}: {}", kind, path, result)
+            else:
+                deleted.append(path)
+        return deleted
+    
     async def cleanup_temp_files(self):
         """Clean up temporary files"""
         try:
-            temp_files = list(self.temp_dir.glob("*"))
-            cleaned_count = 0
-            
-            for temp_file in temp_files:
-                try:
-                    if temp_file.is_file():
-                        temp_file.unlink()
-                        cleaned_count += 1
-                except Exception as e:
-                    logger.warning(f"Failed to delete temp file {temp_file}: {e}")
-            
-            logger.info(f"Cleaned up {cleaned_count} temporary files")
+            with os.scandir(self.temp_dir) as entries:
+                temp_files = [entry.path for entry in entries if entry.is_file()]
+            
+            cleaned_count = len(await self._unlink_all(temp_files, "temp file"))
+            
+            logger.info("Cleaned up {} temporary files", cleaned_count)
             return cleaned_count
             
         except Exception as e:
-            logger.error(f"Error during temp file cleanup: {str(e)}")
+            logger.error("Error during temp file cleanup: {}", e)
             return 0
     
     async def cleanup_old_animations(self, days: int = 7):
@@ -137,45 +225,82 @@ class FileService:
             Number of files cleaned up
         """
         try:
-            import time
             cutoff_time = time.time() - (days * 24 * 60 * 60)
+            old_files = []
+            
+            # Single directory pass; DirEntry caches the file type from readdir
+            with os.scandir(self.animation_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.mp4'):
+                        continue
+                    try:
+                        if entry.is_file() and entry.stat().st_ctime < cutoff_time:
+                            old_files.append(entry.path)
+                    except Exception as e:
+                        logger.warning("Failed to check old animation {}: {}", entry.path, e)
+            
+            deleted_names = {os.path.basename(path) for path in await self._unlink_all(old_files, "old animation")}
+            for name in deleted_names:
+                logger.info("Deleted old animation: {}", name)
+            cleaned_count = len(deleted_names)
+            
+            logger.info("Cleaned up {} old animation files", cleaned_count)
             
-            animation_files = list(self.animation_dir.glob("*.mp4"))
-            cleaned_count = 0
+            # Forget search results pointing at deleted files
+            if deleted_names:
+                self._path_cache = {
+                    task_id: path for task_id, path in self._path_cache.items()
+                    if path.name not in deleted_names
+                }
             
-            for anim_file in animation_files:
-                try:
-                    if anim_file.stat().st_ctime < cutoff_time:
-                        anim_file.unlink()
-                        cleaned_count += 1
-                        logger.info(f"Deleted old animation: {anim_file.name}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete old animation {anim_file}: {e}")
+            # Trim reusable renders, least recently used first
+            evicted = await asyncio.to_thread(self.render_cache.evict, settings.render_cache_max_mb * 1024 * 1024)
+            if evicted:
+                logger.info("Evicted {} cached renders", evicted)
             
-            logger.info(f"Cleaned up {cleaned_count} old animation files")
             return cleaned_count
             
         except Exception as e:
-            logger.error(f"Error during animation cleanup: {str(e)}")
+            logger.error("Error during animation cleanup: {}", e)
             return 0
     
+    @staticmethod
+    def _scan_dir(directory: Path, suffix: str = '') -> Tuple[int, int]:
+        """
+        Count directory entries and sum the sizes of the regular files among them
+        
+        Args:
+            directory: Directory to scan (not recursive)
+            suffix: Only consider entries whose name ends with this suffix
+            
+        Returns:
+            Tuple of (entry count, total file size in bytes)
+        """
+        count = 0
+        size = 0
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(suffix):
+                    continue
+                count += 1
+                if entry.is_file():
+                    size += entry.stat().st_size
+        return count, size
+    
     def get_storage_stats(self) -> Dict[str, Any]:
         """Get storage statistics"""
         try:
-            animation_files = list(self.animation_dir.glob("*.mp4"))
-            temp_files = list(self.temp_dir.glob("*"))
-            
-            animation_size = sum(f.stat().st_size for f in animation_files if f.is_file())
-            temp_size = sum(f.stat().st_size for f in temp_files if f.is_file())
+            animation_count, animation_size = self._scan_dir(self.animation_dir, '.mp4')
+            temp_count, temp_size = self._scan_dir(self.temp_dir)
             
             return {
-                "animation_count": len(animation_files),
+                "animation_count": animation_count,
                 "animation_size_mb": round(animation_size / (1024 * 1024), 2),
-                "temp_files_count": len(temp_files),
+                "temp_files_count": temp_count,
                 "temp_size_mb": round(temp_size / (1024 * 1024), 2),
                 "total_size_mb": round((animation_size + temp_size) / (1024 * 1024), 2)
             }
             
         except Exception as e:
-            logger.error(f"Error getting storage stats: {str(e)}")
+            logger.error("Error getting storage stats: {}", e)
             return {"error": str(e)}
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Shared helper utilities
+"""
+import functools
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import orjson
+from redis.exceptions import RedisError
+from app.core.redis_client import redis_client
+from app.utils.logger import logger
+
+
+def redis_cached(prefix: str, key_func: Callable[..., str], ttl: int = 86400):
+    """
+    Cache the JSON-serializable result of an async function in Redis
+    
+    Args:
+        prefix: Key namespace, e.g. "gemini"
+        key_func: Builds the cache key from the wrapped function's arguments
+        ttl: Seconds before a cached result expires
+        
+    Redis errors are logged and treated as a cache miss so the wrapped call still runs.
+    The wrapper's invalidate(*args, **kwargs) drops the entry those arguments map to.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = f"{prefix}:{key_func(*args, **kwargs)}"
+            
+            try:
+                cached = await redis_client.get(key)
+                if cached is not None:
+                    logger.debug(f"Cache hit for {key}")
+                    return orjson.loads(cached)
+            except RedisError as e:
+                logger.warning(f"Cache lookup failed for {key}: {e}")
+            
+            result = await func(*args, **kwargs)
+            
+            try:
+                await redis_client.set(key, orjson.dumps(result), ex=ttl)
+            except RedisError as e:
+                logger.warning(f"Cache store failed for {key}: {e}")
+            
+            return result
+        
+        async def invalidate(*args, **kwargs):
+            """Forget the cached result for these arguments"""
+            key = f"{prefix}:{key_func(*args, **kwargs)}"
+            try:
+                await redis_client.delete(key)
+            except RedisError as e:
+                logger.warning(f"Cache invalidation failed for {key}: {e}")
+        
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
+
+
+def cached_with_ttl(ttl: float):
+    """
+    Cache the result of an argument-less async function for ttl seconds
+    
+    Args:
+        ttl: Seconds a computed result stays valid (measured on the monotonic clock)
+    """
+    def decorator(func: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+        entry: Optional[Tuple[float, Any]] = None  # (expiry, value)
+        
+        @functools.wraps(func)
+        async def wrapper():
+            nonlocal entry
+            now = time.monotonic()
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            
+            value = await func()
+            entry = (now + ttl, value)
+            return value
+        return wrapper
+    return decorator
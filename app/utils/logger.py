@@ -2,6 +2,7 @@
 Logging configuration using loguru
 """
 import sys
+from pathlib import Path
 from loguru import logger
 from app.core.config import settings
 
@@ -20,38 +21,44 @@ def setup_logger():
         "<level>{message}</level>"
     )
     
+    # Frame-by-frame tracebacks with local variables are slow and can leak secrets
+    diagnose = settings.debug
+    log_dir = Path(settings.log_dir)
+    
     # Console logging
     logger.add(
         sys.stdout,
         format=log_format,
         level="DEBUG" if settings.debug else "INFO",
         colorize=True,
-        backtrace=True,
-        diagnose=True
+        backtrace=diagnose,
+        diagnose=diagnose
     )
     
     # File logging
     logger.add(
-        "logs/app.log",
+        log_dir / "app.log",
         format=log_format,
         level="INFO",
         rotation="10 MB",
         retention="7 days",
         compression="zip",
-        backtrace=True,
-        diagnose=True
+        enqueue=True,  # write from a background thread, off the event loop
+        backtrace=diagnose,
+        diagnose=diagnose
     )
     
     # Error file logging
     logger.add(
-        "logs/errors.log",
+        log_dir / "errors.log",
         format=log_format,
         level="ERROR",
         rotation="5 MB",
         retention="30 days",
         compression="zip",
-        backtrace=True,
-        diagnose=True
+        enqueue=True,  # write from a background thread, off the event loop
+        backtrace=diagnose,
+        diagnose=diagnose
     )
     
     return logger
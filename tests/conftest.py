@@ -0,0 +1,41 @@
+"""
+Test configuration: keep the service local (no Redis, no render workers)
+and write its files to a scratch directory instead of the repository
+"""
+import atexit
+import os
+import shutil
+import tempfile
+from datetime import datetime
+import pytest_asyncio
+
+_scratch_dir = tempfile.mkdtemp(prefix="2d2-tests-")
+atexit.register(shutil.rmtree, _scratch_dir, ignore_errors=True)
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["TASK_STORE_BACKEND"] = "memory"
+os.environ["MANIM_WORKERS"] = "0"
+os.environ["OUTPUT_DIR"] = _scratch_dir
+os.environ["TEMP_DIR"] = os.path.join(_scratch_dir, "temp")
+os.environ["ANIMATION_DIR"] = os.path.join(_scratch_dir, "animations")
+os.environ["MANIM_MEDIA_DIR"] = os.path.join(_scratch_dir, "media")
+os.environ["LOG_DIR"] = os.path.join(_scratch_dir, "logs")
+
+from app.services.animation_service import AnimationService  # noqa: E402, settings read the environment above
+
+
+@pytest_asyncio.fixture
+async def service():
+    """Service with one task that is mid-render"""
+    service = AnimationService()
+    await service.store.create("task-1", {
+        'status': 'processing',
+        'progress': 50,
+        'message': 'Generating animation...',
+        'created_at': datetime.now(),
+        'prompt_preview': 'a circle'
+    })
+    yield service
+    
+    if service._flusher_task is not None:
+        service._flusher_task.cancel()
@@ -0,0 +1,111 @@
+"""
+Tests for how AnimationService stores and writes task status and wakes waiters
+"""
+import asyncio
+import pytest
+from app.core.task_store import TaskStore
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_requeues_updates_and_retries(service, monkeypatch):
+    real_update_many = service.store.update_many
+    calls = 0
+    
+    async def flaky_update_many(updates):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ConnectionError("redis blip")
+        return await real_update_many(updates)
+    
+    monkeypatch.setattr(service.store, "update_many", flaky_update_many)
+    
+    waiter = asyncio.create_task(service.wait_for_update("task-1", timeout=5))
+    await asyncio.sleep(0)
+    
+    await service._update_task_status("task-1", 'completed', 100, 'Done', file_url='/download/task-1')
+    
+    # The flusher retries after the failed write and wakes the waiter
+    assert await waiter is True
+    assert calls == 2
+    assert service.store.tasks["task-1"]['status'] == 'completed'
+    assert service._pending == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_newer_pending_fields(service, monkeypatch):
+    
+    async def failing_update_many(updates):
+        # An update queued while the write is in flight must win over the failed batch
+        await service._update_task_status("task-1", 'completed', 100, 'Done')
+        raise ConnectionError("redis blip")
+    
+    service._pending["task-1"] = {'status': 'processing', 'progress': 90, 'message': 'Finalizing'}
+    monkeypatch.setattr(service.store, "update_many", failing_update_many)
+    
+    assert await service.flush_pending() is False
+    assert service._pending["task-1"]['status'] == 'completed'
+    assert service._pending["task-1"]['progress'] == 100
+    assert service._flush_event.is_set()
+
+
+@pytest.mark.asyncio
+async def test_status_does_not_go_back_during_flush(service, monkeypatch):
+    real_update_many = service.store.update_many
+    write_started = asyncio.Event()
+    release_write = asyncio.Event()
+    
+    async def slow_update_many(updates):
+        write_started.set()
+        await release_write.wait()
+        return await real_update_many(updates)
+    
+    monkeypatch.setattr(service.store, "update_many", slow_update_many)
+    
+    service._pending["task-1"] = {'status': 'completed', 'progress': 100, 'message': 'Done'}
+    flush = asyncio.create_task(service.flush_pending())
+    await write_started.wait()
+    
+    status = await service.get_animation_status("task-1")
+    assert status.status == 'completed'
+    
+    release_write.set()
+    assert await flush is True
+    assert (await service.get_animation_status("task-1")).status == 'completed'
+
+
+@pytest.mark.asyncio
+async def test_update_during_status_read_wakes_waiter(service, monkeypatch):
+    real_get_task = service._get_task
+    
+    async def get_task_then_update(task_id):
+        task = await real_get_task(task_id)
+        # The task changes after it was read, but before the waiter sleeps
+        await service._notify_task_update(task_id)
+        return task
+    
+    monkeypatch.setattr(service, "_get_task", get_task_then_update)
+    
+    assert await service.wait_for_update("task-1", timeout=0.5) is True
+
+
+@pytest.mark.asyncio
+async def test_wait_returns_at_once_when_caller_is_behind(service):
+    seen = {'status': 'pending', 'progress': 0}
+    
+    assert await service.wait_for_update("task-1", timeout=0.5, seen=seen) is True
+    assert await service.wait_for_update("task-1", timeout=0.1, seen={'status': 'processing', 'progress': 50}) is False
+
+
+@pytest.mark.asyncio
+async def test_unreachable_task_store_falls_back_to_memory(service, monkeypatch):
+    
+    async def unavailable():
+        return False
+    
+    monkeypatch.setattr(service.store, "is_available", unavailable)
+    
+    await service.check_task_store()
+    
+    assert type(service.store) is TaskStore
+    assert await service.store.get("task-1") is None
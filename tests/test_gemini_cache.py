@@ -0,0 +1,34 @@
+"""
+Tests for dropping cached Gemini responses whose code fails to render
+"""
+import orjson
+import pytest
+from app.core import gemini_client
+from app.models.requests import AnimationRequest
+from app.utils import helpers
+
+
+@pytest.mark.asyncio
+async def test_failed_render_invalidates_cached_gemini_response(service, monkeypatch):
+    deleted = []
+    cached_response = {'manim_code': 'broken', 'refined_prompt': 'p', 'original_prompt': 'p', 'explanation': ''}
+    
+    async def fake_get(key):
+        return orjson.dumps(cached_response)
+    
+    async def fake_delete(key):
+        deleted.append(key)
+    
+    async def fake_render(**kwargs):
+        return {'success': False, 'error': 'render_timeout', 'task_id': kwargs['task_id']}
+    
+    # A cache hit hands back code that has failed to render before
+    monkeypatch.setattr(helpers.redis_client, "get", fake_get)
+    monkeypatch.setattr(helpers.redis_client, "delete", fake_delete)
+    monkeypatch.setattr(service.manim_processor, "generate_animation", fake_render)
+    
+    request = AnimationRequest(prompt="draw a circle that grows")
+    await service._process_animation("task-1", request)
+    
+    expected = gemini_client._prompt_cache_key(service.gemini_client, request.prompt, request.style, request.duration)
+    assert deleted == [f"gemini:{expected}"]
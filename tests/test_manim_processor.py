@@ -0,0 +1,57 @@
+"""
+Tests for how ManimProcessor follows the render driver's output
+"""
+import asyncio
+from collections import deque
+import pytest
+from app.core.manim_processor import ManimProcessor
+
+# As Manim 0.18 logs a failed Tex compile through its rich console
+LATEX_ERROR_LINE = (
+    "[10/15/26 22:23:59] ERROR    LaTeX compilation error: LaTeX Error: File "
+    "`standalone.cls' not found.                       tex_file_writing.py:314"
+)
+
+
+def _stream(*chunks: bytes) -> asyncio.StreamReader:
+    """Stream that yields the given chunks and then ends"""
+    stream = asyncio.StreamReader()
+    for chunk in chunks:
+        stream.feed_data(chunk)
+    stream.feed_eof()
+    return stream
+
+
+@pytest.mark.asyncio
+async def test_latex_compilation_error_stops_the_render():
+    stream = _stream(
+        b"Animation 0: Write(MathTex):   0%|          | 0/60\r",
+        LATEX_ERROR_LINE.encode() + b"\n",
+        b"Traceback (most recent call last):\n"
+    )
+    tail = deque(maxlen=10)
+    
+    fatal_line = await ManimProcessor()._watch_output(stream, tail, None)
+    
+    assert fatal_line == LATEX_ERROR_LINE
+    assert list(tail) == [LATEX_ERROR_LINE]
+
+
+@pytest.mark.asyncio
+async def test_progress_is_reported_and_not_kept_in_tail():
+    stream = _stream(
+        b"Animation 0: Create(Circle):  50%|#####     | 30/60\r",
+        b"Animation 0: Create(Circle): 100%|##########| 60/60\r",
+        b"INFO     Rendered GeneratedAnimation\n"
+    )
+    tail = deque(maxlen=10)
+    progress = []
+    
+    async def progress_callback(animation: int, percent: int):
+        progress.append((animation, percent))
+    
+    fatal_line = await ManimProcessor()._watch_output(stream, tail, progress_callback)
+    
+    assert fatal_line is None
+    assert progress == [(0, 50), (0, 100)]
+    assert list(tail) == ["INFO     Rendered GeneratedAnimation"]